@@ -1,4 +1,10 @@
 import streamlit as st
+from olist.cache import get_data_version
+from olist.figures import init_get_figure_cache
 
 st.write("# Kaggle Olist dataset")
-st.image('./src/streamlit/database.png')
\ No newline at end of file
+st.image('./src/streamlit/database.png')
+
+# The Categorias figures start building in the background on the first visit
+# to the app, not on the first visit to that page.
+init_get_figure_cache(get_data_version())
@@ -0,0 +1,317 @@
+import argparse
+import glob
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Callable
+import numpy as np
+import pandas as pd
+from olist.tables import DATA_PATH, TABLE_SPECS
+
+# Benchmarks for the builders behind both pages and for the map build, plus a
+# headless replay of the widgets. Each dataset runs in its own process so the
+# Streamlit caches and the peak memory start from zero.
+BENCH_SCALES = [1, 10, 100]
+BENCH_REPEAT = 3
+PAGES_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'pages')
+
+# Id columns renamed per copy when a dataset is scaled; tables not listed here
+# (products, sellers, category translation) are dimensions and are kept as is.
+SCALED_ID_COLUMNS = {
+    'df_customers': ['customer_id', 'customer_unique_id'],
+    'df_orders': ['order_id', 'customer_id'],
+    'df_order_items': ['order_id'],
+    'df_order_payments': ['order_id'],
+    'df_geolocation': [],
+}
+
+def scale_dataset(data_path: str, output_path: str, factor: int, seed: int = 0)-> str:
+    # Copies are written one at a time, so scaling never holds more than one
+    # copy of a table. Ids get a per-copy suffix and stay consistent across tables.
+    rng = np.random.default_rng(seed)
+    os.makedirs(output_path, exist_ok=True)
+    for name, spec in TABLE_SPECS.items():
+        source_path = f'{data_path}/{spec.file_name}'
+        target_path = f'{output_path}/{spec.file_name}'
+        if name not in SCALED_ID_COLUMNS or factor == 1:
+            shutil.copyfile(source_path, target_path)
+            continue
+        df = pd.read_csv(source_path, dtype=str, keep_default_na=False)
+        for copy in range(factor):
+            df_copy = df.copy()
+            for column in SCALED_ID_COLUMNS[name]:
+                df_copy[column] = df_copy[column] + f'{copy:04x}'
+            if name == 'df_geolocation' and copy > 0:
+                for column in ['geolocation_lat', 'geolocation_lng']:
+                    jitter = rng.normal(0, 0.001, len(df_copy))
+                    df_copy[column] = (pd.to_numeric(df_copy[column]) + jitter).round(6).astype(str)
+            df_copy.to_csv(target_path, mode='w' if copy == 0 else 'a', header=copy == 0, index=False)
+    return output_path
+
+SCALED_MANIFEST = 'bench_manifest.json'
+
+def prepare_scaled_dataset(data_path: str, output_path: str, factor: int, seed: int = 0)-> str:
+    # A scaled copy is reused only while it was built from the same source
+    # files with the same factor; otherwise it is rebuilt from scratch.
+    from olist.cache import source_data_version
+
+    manifest = {'source_data_version': source_data_version(data_path), 'factor': factor, 'seed': seed}
+    manifest_path = f'{output_path}/{SCALED_MANIFEST}'
+    try:
+        with open(manifest_path) as file:
+            if json.load(file) == manifest:
+                return output_path
+    except (OSError, ValueError):
+        pass
+    shutil.rmtree(output_path, ignore_errors=True)
+    scale_dataset(data_path, output_path, factor, seed)
+    with open(manifest_path, 'w') as file:
+        json.dump(manifest, file)
+    return output_path
+
+def measure(function: Callable[[], object], rows: Callable[[object], int] | int, repeat: int = BENCH_REPEAT)-> dict:
+    # Time and memory are measured in separate runs: tracemalloc slows allocations.
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        seconds.append(time.perf_counter() - start)
+    tracemalloc.start()
+    function()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    row_count = rows(result) if callable(rows) else rows
+    return {
+        'rows': int(row_count),
+        'wall_seconds': min(seconds),
+        'mean_seconds': float(np.mean(seconds)),
+        'peak_mb': round(peak / 2 ** 20, 3),
+        'rows_per_second': round(row_count / min(seconds), 1) if min(seconds) > 0 else None,
+    }
+
+def _count_rows(path: str)-> int:
+    with open(path, 'rb') as file:
+        return sum(1 for _ in file) - 1
+
+def builder_cases(data_path: str)-> dict[str, dict]:
+    from olist.cache import build_cache
+    from olist.loader import OlistCatalog
+    from olist.categories import CATEGORY_FACT_COLUMNS, create_category_fact_table, create_category_dataframe, create_macro_category_dataframe
+    from olist.cube import CUBE_COLUMNS, create_revenue_cube
+    from olist.geo import (
+        GEO_CATEGORIES_COLUMNS,
+        ZipCentroidIndex,
+        create_enriched_geo_orders_dataframe,
+        create_geo_categories_dataframe,
+        create_geolocation_orders_dataframe,
+    )
+    from olist.filters import FilterIndex
+    from olist.flows import FLOW_COLUMNS, create_flow_items_dataframe, create_od_matrix
+    from olist.engine import PandasEngine, create_engine
+    from olist.spatial import bin_points
+    from olist.tiles import TilePyramid, style_features
+    from olist.render import add_cells_layer, add_points_layer
+    from olist.taxonomy import color_of
+    import folium
+
+    cache_path = f'{data_path}/.cache'
+    results = {}
+
+    def cold_build():
+        shutil.rmtree(cache_path, ignore_errors=True)
+        return build_cache(data_path, cache_path, executor='thread')
+    total_rows = sum(_count_rows(f'{data_path}/{spec.file_name}') for spec in TABLE_SPECS.values())
+    results['cache_build_cold'] = measure(cold_build, total_rows, repeat=1)
+    results['catalog_load_warm'] = measure(
+        lambda: OlistCatalog(data_path, cache_path).load_all(),
+        lambda df_obj: sum(len(df) for df in df_obj.loaded_tables().values())
+    )
+
+    df_obj = OlistCatalog(data_path, cache_path).load_all()
+    n_items = len(df_obj.df_order_items)
+    engine = create_engine()
+    results['category_fact_table'] = measure(lambda: create_category_fact_table(df_obj.project(CATEGORY_FACT_COLUMNS)), n_items)
+    results['revenue_cube'] = measure(lambda: create_revenue_cube(df_obj.project(CUBE_COLUMNS)), n_items)
+    df_cube = create_revenue_cube(df_obj)
+    results['category_dataframe'] = measure(lambda: create_category_dataframe(df_cube, engine), len(df_cube))
+    results['macro_category_dataframe'] = measure(lambda: create_macro_category_dataframe(df_cube, engine), len(df_cube))
+
+    results['zip_centroid_index'] = measure(lambda: ZipCentroidIndex.from_geolocation(df_obj.df_geolocation), len(df_obj.df_geolocation))
+    zip_index = ZipCentroidIndex.from_geolocation(df_obj.df_geolocation)
+    results['geolocation_orders_dataframe'] = measure(lambda: create_geolocation_orders_dataframe(df_obj, zip_index, engine), len(df_obj.df_orders))
+    results['geo_categories_dataframe'] = measure(lambda: create_geo_categories_dataframe(df_obj.project(GEO_CATEGORIES_COLUMNS), zip_index, engine), n_items)
+    results['enriched_geo_orders'] = measure(lambda: create_enriched_geo_orders_dataframe(df_obj, zip_index, engine), n_items)
+    results['od_matrix'] = measure(lambda: create_od_matrix(create_flow_items_dataframe(df_obj.project(FLOW_COLUMNS), zip_index, engine), engine), n_items)
+    df_enriched = create_enriched_geo_orders_dataframe(df_obj, zip_index, PandasEngine())
+    results['filter_index'] = measure(lambda: FilterIndex.from_frame(df_enriched), len(df_enriched))
+
+    filter_index = FilterIndex.from_frame(df_enriched)
+    mask = filter_index.select_mask({'year': [2018]})
+    df_filtered = filter_index.df[mask]
+
+    def map_points():
+        df_points = filter_index.ranked_window(mask, 'price', 0, 1000)
+        df_points = df_points.assign(radius=4, color=color_of(df_points['product_macro_category_rename']), opacity=0.4)
+        mapa = folium.Map(location=[-20.0801, -45.9292], prefer_canvas=True, zoom_start=4)
+        add_points_layer(mapa, df_points, ['product_macro_category_rename', 'price'], ['Categoria:', 'Valor total:'], 'product_macro_category_rename')
+        return mapa.get_root().render()
+    results['map_points_1000'] = measure(map_points, min(1000, len(df_filtered)))
+
+    def map_cells():
+        df_cells = bin_points(df_filtered, cell_size=0.5, kind='hex')
+        df_cells = df_cells.assign(color=color_of(df_cells['product_macro_category_rename']), opacity=0.5)
+        mapa = folium.Map(location=[-20.0801, -45.9292], prefer_canvas=True, zoom_start=4)
+        add_cells_layer(mapa, df_cells, 0.5, 'hex', ['count', 'price'], ['Pedidos:', 'Valor total:'])
+        return mapa.get_root().render()
+    results['map_cells_hex'] = measure(map_cells, len(df_filtered))
+
+    def map_tiles():
+        pyramid = TilePyramid.from_points(df_filtered)
+        return style_features(pyramid.query(None, 6), 6)
+    results['map_tile_pyramid'] = measure(map_tiles, len(df_filtered))
+    return results
+
+def _page_path(pattern: str)-> str:
+    return glob.glob(os.path.join(PAGES_PATH, pattern))[0]
+
+def replay_cases()-> dict[str, dict]:
+    # Typical widget sequences; each step is one Streamlit rerun. The first
+    # step of each page is the cold run that fills the resource caches.
+    from streamlit.testing.v1 import AppTest
+
+    def run_steps(page: str, steps: list[tuple[str, Callable]])-> dict:
+        app = AppTest.from_file(page, default_timeout=600)
+        step_results = []
+        tracemalloc.start()
+        for label, action in steps:
+            start = time.perf_counter()
+            action(app).run()
+            step_results.append({
+                'step': label,
+                'wall_seconds': time.perf_counter() - start,
+                'exceptions': [str(exception.value) for exception in app.exception],
+            })
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return {
+            'wall_seconds': sum(step['wall_seconds'] for step in step_results),
+            'peak_mb': round(peak / 2 ** 20, 3),
+            'steps': step_results,
+        }
+
+    def set_quantity(app):
+        slider = app.select_slider(key='quantidade_mapa')
+        upper = min(2000, max(len(slider.options) - 1, 1))
+        return slider.set_range(0, upper)
+
+    localizacao_steps = [
+        ('cold', lambda app: app),
+        ('ano_mapa=2017', lambda app: app.radio(key='ano_mapa').set_value(2017)),
+        ('regiao=Sudeste,Sul', lambda app: app.multiselect[0].set_value([region for region in app.multiselect[0].options if region in ('Sudeste', 'Sul')])),
+        ('quantidade_mapa=0..2000', set_quantity),
+        ('ordem_mapa=Frete', lambda app: app.radio(key='ordem_mapa').set_value('Frete')),
+        ('tamanho_mapa=Nenhum', lambda app: app.radio(key='tamanho_mapa').set_value('Nenhum')),
+        ('modo_mapa=Grade', lambda app: app.radio(key='modo_mapa').set_value('Grade')),
+        ('modo_mapa=Hexágonos', lambda app: app.radio(key='modo_mapa').set_value('Hexágonos')),
+        ('modo_mapa=Automático', lambda app: app.radio(key='modo_mapa').set_value('Automático (zoom)')),
+        ('ano_mapa=2018', lambda app: app.radio(key='ano_mapa').set_value(2018)),
+        # First paint of the progressive mode: the grid plus one batch of points.
+        ('modo_mapa=Progressivo', lambda app: app.radio(key='modo_mapa').set_value('Pontos (progressivo)')),
+        ('ano_mapa=2017 (progressivo)', lambda app: app.radio(key='ano_mapa').set_value(2017)),
+    ]
+    categorias_steps = [
+        ('cold', lambda app: app),
+        ('group_by_macro_category', lambda app: app.toggle(key='group_by_macro_category').set_value(True)),
+        ('data_frame_toggle', lambda app: app.toggle(key='data_frame_toggle').set_value(True)),
+        ('data_frame_toggle_tendency', lambda app: app.toggle(key='data_frame_toggle_tendency').set_value(True)),
+        ('rerun', lambda app: app),
+    ]
+    fluxos_steps = [
+        ('cold', lambda app: app),
+        ('metrica_fluxos=Itens', lambda app: app.radio(key='metrica_fluxos').set_value('Itens')),
+        ('itens_fluxos=1', lambda app: app.slider(key='itens_fluxos').set_value(1)),
+        ('ano_fluxos=2018', lambda app: app.multiselect(key='ano_fluxos').set_value([2018])),
+    ]
+    return {
+        'replay_categorias': run_steps(_page_path('1_*.py'), categorias_steps),
+        'replay_localizacao': run_steps(_page_path('2_*.py'), localizacao_steps),
+        'replay_fluxos': run_steps(_page_path('3_*.py'), fluxos_steps),
+    }
+
+def run_dataset(data_path: str, replay: bool = True)-> dict[str, dict]:
+    results = builder_cases(data_path)
+    if replay:
+        results.update(replay_cases())
+    return results
+
+def run_benchmarks(data_path: str = DATA_PATH, scales: list[int] = BENCH_SCALES, work_path: str = './bench', replay: bool = True)-> dict:
+    from olist.config import INGESTION_MODE, QUERY_ENGINE
+
+    report = {
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'engine': QUERY_ENGINE,
+        'ingestion': INGESTION_MODE,
+        'cpu_count': os.cpu_count(),
+        'results': [],
+    }
+    for scale in scales:
+        scaled_path = os.path.abspath(f'{work_path}/x{scale}')
+        prepare_scaled_dataset(data_path, scaled_path, scale)
+        # A fresh interpreter per dataset, with the pages pointed at it.
+        completed = subprocess.run(
+            [sys.executable, '-m', 'olist.bench', 'dataset', scaled_path] + ([] if replay else ['--no-replay']),
+            env={**os.environ, 'OLIST_DATA_PATH': scaled_path},
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        for case, result in json.loads(completed.stdout.splitlines()[-1]).items():
+            report['results'].append({'dataset': f'x{scale}', 'scale': scale, 'case': case, **result})
+    return report
+
+def compare_reports(baseline: dict, candidate: dict)-> pd.DataFrame:
+    columns = ['dataset', 'case', 'wall_seconds', 'peak_mb']
+    df_baseline = pd.DataFrame(baseline['results'])[columns]
+    df_candidate = pd.DataFrame(candidate['results'])[columns]
+    df_compare = df_baseline.merge(df_candidate, on=['dataset', 'case'], suffixes=('_baseline', '_candidate'))
+    df_compare['time_ratio'] = (df_compare['wall_seconds_candidate'] / df_compare['wall_seconds_baseline']).round(3)
+    df_compare['memory_ratio'] = (df_compare['peak_mb_candidate'] / df_compare['peak_mb_baseline']).round(3)
+    return df_compare
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmarks das páginas Categorias e Localização')
+    commands = parser.add_subparsers(dest='command', required=True)
+    run_parser = commands.add_parser('run')
+    run_parser.add_argument('--data-path', default=DATA_PATH)
+    run_parser.add_argument('--scales', type=int, nargs='+', default=BENCH_SCALES)
+    run_parser.add_argument('--work-path', default='./bench')
+    run_parser.add_argument('--output', default=None)
+    run_parser.add_argument('--no-replay', action='store_true')
+    dataset_parser = commands.add_parser('dataset')
+    dataset_parser.add_argument('data_path')
+    dataset_parser.add_argument('--no-replay', action='store_true')
+    compare_parser = commands.add_parser('compare')
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('candidate')
+    args = parser.parse_args()
+
+    if args.command == 'dataset':
+        print(json.dumps(run_dataset(args.data_path, replay=not args.no_replay)))
+    elif args.command == 'run':
+        report = run_benchmarks(args.data_path, args.scales, args.work_path, replay=not args.no_replay)
+        output = args.output or f'{args.work_path}/bench-{datetime.now():%Y%m%d-%H%M%S}.json'
+        with open(output, 'w') as file:
+            json.dump(report, file, indent=2)
+        print(pd.DataFrame(report['results'])[['dataset', 'case', 'rows', 'wall_seconds', 'peak_mb', 'rows_per_second']].to_string(index=False))
+        print(f'\n{output}')
+    else:
+        with open(args.baseline) as baseline_file, open(args.candidate) as candidate_file:
+            print(compare_reports(json.load(baseline_file), json.load(candidate_file)).to_string(index=False))
@@ -0,0 +1,193 @@
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import hashlib
+import json
+import os
+import tempfile
+import time
+from typing import Callable
+import pandas as pd
+import pyarrow as pa
+from olist.tables import DATA_PATH, TABLE_SPECS, read_table
+from olist.config import CACHE_BUILD_EXECUTOR, LOAD_WORKERS
+from olist.shared import current_shared_version, read_shared_table
+
+CACHE_PATH = f'{DATA_PATH}/.cache'
+
+# Bump whenever a table transform changes its output so stale caches rebuild.
+CACHE_VERSION = 2
+
+def _file_sha256(path: str)-> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _manifest_path(name: str, cache_path: str)-> str:
+    return f'{cache_path}/{name}.json'
+
+def _parquet_path(name: str, cache_path: str)-> str:
+    return f'{cache_path}/{name}.parquet'
+
+def _read_manifest(name: str, cache_path: str)-> dict | None:
+    try:
+        with open(_manifest_path(name, cache_path)) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+def _write_atomically(path: str, write: Callable[[str], None]):
+    # Each writer gets its own temp file, so server processes cold-starting
+    # together never write into each other's file; the last rename wins.
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=f'{os.path.basename(path)}.', suffix='.tmp')
+    os.close(fd)
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+def _write_manifest(name: str, cache_path: str, manifest: dict):
+    def write(tmp_path: str):
+        with open(tmp_path, 'w') as file:
+            json.dump(manifest, file)
+    _write_atomically(_manifest_path(name, cache_path), write)
+
+def _write_parquet(df: pd.DataFrame, name: str, cache_path: str):
+    _write_atomically(
+        _parquet_path(name, cache_path),
+        lambda tmp_path: df.to_parquet(tmp_path, engine='pyarrow', index=False, use_dictionary=True, compression='zstd')
+    )
+
+def is_cache_fresh(name: str, data_path: str = DATA_PATH, cache_path: str = CACHE_PATH)-> bool:
+    manifest = _read_manifest(name, cache_path)
+    if manifest is None or manifest.get('version') != CACHE_VERSION:
+        return False
+    if not os.path.exists(_parquet_path(name, cache_path)):
+        return False
+
+    source_path = f'{data_path}/{TABLE_SPECS[name].file_name}'
+    stat = os.stat(source_path)
+    if manifest['mtime_ns'] == stat.st_mtime_ns and manifest['size'] == stat.st_size:
+        return True
+
+    # A touched but unchanged CSV (e.g. after a fresh checkout) keeps its cache.
+    if manifest['size'] == stat.st_size and manifest['sha256'] == _file_sha256(source_path):
+        manifest['mtime_ns'] = stat.st_mtime_ns
+        try:
+            _write_manifest(name, cache_path, manifest)
+        except OSError:
+            # Read-only cache: the hash is checked again next time.
+            pass
+        return True
+    return False
+
+def build_table_cache(
+        name: str,
+        data_path: str = DATA_PATH,
+        cache_path: str = CACHE_PATH,
+        timings: dict[str, float] | None = None
+    )-> pd.DataFrame:
+    source_path = f'{data_path}/{TABLE_SPECS[name].file_name}'
+    stat = os.stat(source_path)
+    df = read_table(name, data_path, timings)
+    start = time.perf_counter()
+
+    os.makedirs(cache_path, exist_ok=True)
+    _write_parquet(df, name, cache_path)
+    _write_manifest(name, cache_path, {
+        'version': CACHE_VERSION,
+        'source': TABLE_SPECS[name].file_name,
+        'mtime_ns': stat.st_mtime_ns,
+        'size': stat.st_size,
+        'sha256': _file_sha256(source_path),
+    })
+    if timings is not None:
+        timings['write'] = time.perf_counter() - start
+    return df
+
+def load_cached_table(
+        name: str,
+        data_path: str = DATA_PATH,
+        cache_path: str = CACHE_PATH,
+        columns: list[str] | None = None
+    )-> pd.DataFrame:
+    if is_cache_fresh(name, data_path, cache_path):
+        try:
+            return pd.read_parquet(_parquet_path(name, cache_path), engine='pyarrow', columns=columns)
+        except (OSError, pa.ArrowInvalid):
+            # A truncated or corrupt file under a fresh manifest is rebuilt below.
+            pass
+    try:
+        df = build_table_cache(name, data_path, cache_path)
+    except OSError:
+        # Read-only deployments still work, they just pay the CSV parse.
+        df = read_table(name, data_path)
+    if columns is not None:
+        df = df[columns]
+    return df
+
+def source_data_version(data_path: str = DATA_PATH)-> str:
+    digest = hashlib.sha256(str(CACHE_VERSION).encode())
+    for name in TABLE_SPECS:
+        stat = os.stat(f'{data_path}/{TABLE_SPECS[name].file_name}')
+        digest.update(f'{name}:{stat.st_mtime_ns}:{stat.st_size}'.encode())
+    return digest.hexdigest()[:16]
+
+def get_data_version(data_path: str = DATA_PATH)-> str:
+    # With a shared store the published version wins, so every worker swaps to
+    # a refreshed dataset on its next rerun.
+    return current_shared_version() or source_data_version(data_path)
+
+def read_derived_table(name: str, data_version: str, cache_path: str = CACHE_PATH)-> pd.DataFrame | None:
+    df_shared = read_shared_table(name, data_version)
+    if df_shared is not None:
+        return df_shared
+    manifest = _read_manifest(name, cache_path)
+    if manifest is None or manifest.get('data_version') != data_version:
+        return None
+    try:
+        return pd.read_parquet(_parquet_path(name, cache_path), engine='pyarrow')
+    except (OSError, pa.ArrowInvalid):
+        return None
+
+def write_derived_table(name: str, df: pd.DataFrame, data_version: str, cache_path: str = CACHE_PATH):
+    try:
+        os.makedirs(cache_path, exist_ok=True)
+        _write_parquet(df, name, cache_path)
+        _write_manifest(name, cache_path, {'data_version': data_version})
+    except OSError:
+        pass
+
+def _refresh_table_cache(name: str, data_path: str, cache_path: str)-> dict[str, float] | None:
+    # Runs in a worker; returns only timings so no frame is sent back.
+    if is_cache_fresh(name, data_path, cache_path):
+        return None
+    timings = {}
+    build_table_cache(name, data_path, cache_path, timings)
+    return timings
+
+def build_cache(
+        data_path: str = DATA_PATH,
+        cache_path: str = CACHE_PATH,
+        max_workers: int = LOAD_WORKERS,
+        executor: str = CACHE_BUILD_EXECUTOR
+    )-> dict[str, dict[str, float] | None]:
+    # Tables are independent until keys are encoded at load time, so each
+    # one is parsed, cleaned and written by its own worker.
+    os.makedirs(cache_path, exist_ok=True)
+    executor_class = ProcessPoolExecutor if executor == 'process' else ThreadPoolExecutor
+    with executor_class(max_workers=max_workers) as pool:
+        futures = {name: pool.submit(_refresh_table_cache, name, data_path, cache_path) for name in TABLE_SPECS}
+        return {name: future.result() for name, future in futures.items()}
+
+if __name__ == '__main__':
+    for name, timings in build_cache().items():
+        if timings is None:
+            print(f'{name}: atualizado')
+        else:
+            print(f'{name}: reconstruido ' + ' '.join(f'{step}={seconds:.2f}s' for step, seconds in timings.items()))
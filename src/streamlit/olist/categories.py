@@ -0,0 +1,45 @@
+import pandas as pd
+from olist.loader import OlistCatalog
+from olist.engine import QueryEngine, init_get_engine
+from olist.keys import join_columns
+from olist.taxonomy import macro_category_of
+from olist.profiling import profiled
+
+# Columns each table contributes to the fact table, read through the catalog.
+CATEGORY_FACT_COLUMNS = {
+    'df_order_items': ['order_id', 'order_key', 'product_id', 'product_key', 'price', 'freight_value', 'shipping_limit_date', 'year'],
+    'df_products': ['product_category_name', 'product_macro_category'],
+}
+
+@profiled
+def create_category_fact_table(df_obj: OlistCatalog)-> pd.DataFrame:
+    order_items_columns = CATEGORY_FACT_COLUMNS['df_order_items']
+    products_columns = CATEGORY_FACT_COLUMNS['df_products']
+
+    # product_key is the row of df_products, so the inner join is a mask and a take.
+    df_order_items = df_obj.df_order_items
+    mask = df_order_items['year'].between(2017,2018).to_numpy() & (df_order_items['product_key'].to_numpy() >= 0)
+    df_category_fact = df_order_items.loc[mask, order_items_columns].reset_index(drop=True)
+    df_category_fact = df_category_fact.assign(**join_columns(df_obj.df_products, df_category_fact['product_key'].to_numpy(), products_columns))
+    df_category_fact['month'] = df_category_fact['shipping_limit_date'].dt.month.astype('int8')
+    df_category_fact['product_macro_category_rename'] = macro_category_of(df_category_fact['product_macro_category'])
+    return df_category_fact
+
+@profiled
+def create_category_dataframe(df_category_fact: pd.DataFrame, engine: QueryEngine | None = None)-> pd.DataFrame:
+    engine = engine or init_get_engine()
+    agg_dict = {
+        'price':'sum',
+        'product_macro_category_rename': 'first'
+    }
+    group_by_columns = ['product_macro_category','year']
+    df_category_per_year = engine.aggregate(df_category_fact, group_by_columns, agg_dict)
+    return df_category_per_year.sort_values(by=['price','year'], ascending=True)
+
+@profiled
+def create_macro_category_dataframe(df_category_fact: pd.DataFrame, engine: QueryEngine | None = None)-> pd.DataFrame:
+    engine = engine or init_get_engine()
+    agg_dict = {'price':'sum'}
+    group_by_columns = ['product_macro_category_rename','year']
+    df_macro_category_per_year = engine.aggregate(df_category_fact, group_by_columns, agg_dict)
+    return df_macro_category_per_year
@@ -0,0 +1,35 @@
+import os
+
+# 'memory' loads whole tables through the catalog; 'streaming' reads the CSVs in
+# chunks and keeps only the page aggregates, for exports that do not fit in memory.
+INGESTION_MODE = os.environ.get('OLIST_INGESTION', 'memory')
+STREAMING_CHUNK_SIZE = int(os.environ.get('OLIST_CHUNK_SIZE', 200_000))
+
+def is_streaming()-> bool:
+    return INGESTION_MODE == 'streaming'
+
+# Engine behind the dataframe builders: 'pandas' (reference) or 'duckdb'.
+QUERY_ENGINE = os.environ.get('OLIST_ENGINE', 'pandas')
+QUERY_ENGINE_THREADS = int(os.environ['OLIST_ENGINE_THREADS']) if os.environ.get('OLIST_ENGINE_THREADS') else None
+
+# Workers used to read tables and build the Parquet cache concurrently.
+LOAD_WORKERS = int(os.environ.get('OLIST_LOAD_WORKERS', 4))
+# 'thread' or 'process'; processes only pay off when building the cache, where
+# nothing has to be sent back to the app.
+CACHE_BUILD_EXECUTOR = os.environ.get('OLIST_CACHE_EXECUTOR', 'process')
+
+# Upper bound for the serialized Plotly figures kept by the Categorias page.
+FIGURE_CACHE_BYTES = int(float(os.environ.get('OLIST_FIGURE_CACHE_MB', 32)) * 2 ** 20)
+
+# Opt-in instrumentation of the page reruns; OLIST_PROFILE_LOG appends one JSON
+# line per rerun to that file instead of stderr.
+PROFILE_ENABLED = os.environ.get('OLIST_PROFILE', '').lower() in ('1', 'true', 'yes')
+PROFILE_LOG_PATH = os.environ.get('OLIST_PROFILE_LOG')
+
+# Directory of the store published by `python -m olist.shared`. When set, every
+# server process memory-maps the published tables instead of loading its own copy.
+SHARED_STORE_PATH = os.environ.get('OLIST_SHARED_STORE') or None
+
+# Progressive map mode: points sent per batch and seconds between batches.
+MAP_BATCH_SIZE = int(os.environ.get('OLIST_MAP_BATCH', 500))
+MAP_BATCH_INTERVAL = float(os.environ.get('OLIST_MAP_BATCH_INTERVAL', 0.5))
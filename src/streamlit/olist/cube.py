@@ -0,0 +1,95 @@
+import pandas as pd
+from olist.config import is_streaming
+from olist.loader import OlistCatalog, init_get_catalog
+from olist.cache import CACHE_PATH, get_data_version, read_derived_table, write_derived_table
+from olist.categories import CATEGORY_FACT_COLUMNS, create_category_fact_table
+from olist.keys import follow_keys, take_rows
+from olist.geo import init_get_stream_aggregates
+from olist.streaming import stream_revenue_cube
+from olist.taxonomy import region_of
+from olist.profiling import cache_resource, profiled
+from olist.shared import KEEP_VERSIONS
+
+CUBE_NAME = 'revenue_cube'
+
+CUBE_DIMENSIONS = [
+    'product_macro_category',
+    'product_macro_category_rename',
+    'year',
+    'month',
+    'customer_state',
+    'region',
+]
+
+# order_count counts distinct orders per cell, so it is exact for a single
+# cell but may count an order more than once when cells are summed.
+CUBE_MEASURES = ['price', 'freight_value', 'order_count', 'item_count']
+
+CUBE_COLUMNS = {
+    **CATEGORY_FACT_COLUMNS,
+    'df_orders': ['customer_key'],
+    'df_customers': ['customer_state'],
+}
+
+@profiled
+def create_revenue_cube(df_obj: OlistCatalog)-> pd.DataFrame:
+    df_category_fact = create_category_fact_table(df_obj)
+    customer_keys = follow_keys(df_obj.df_orders['customer_key'], df_category_fact['order_key'].to_numpy())
+    df_category_fact['customer_state'] = take_rows(df_obj.df_customers['customer_state'], customer_keys)
+    df_category_fact['customer_state'] = df_category_fact['customer_state'].astype('category')
+    df_category_fact['region'] = region_of(df_category_fact['customer_state'])
+
+    agg_dict = {
+        'price': 'sum',
+        'freight_value': 'sum',
+        'order_count': 'nunique',
+        'item_count': 'size',
+    }
+    df_cube = df_category_fact.assign(
+        order_count=df_category_fact['order_key'],
+        item_count=1
+    ).groupby(CUBE_DIMENSIONS, observed=True, dropna=False).agg(agg_dict).reset_index()
+    df_cube['order_count'] = df_cube['order_count'].astype('int32')
+    df_cube['item_count'] = df_cube['item_count'].astype('int32')
+    return df_cube
+
+@profiled
+def load_revenue_cube(df_obj: OlistCatalog, data_version: str, cache_path: str = CACHE_PATH)-> pd.DataFrame:
+    df_cube = read_derived_table(CUBE_NAME, data_version, cache_path)
+    if df_cube is None:
+        df_cube = stream_revenue_cube(init_get_stream_aggregates(data_version)) if is_streaming() else create_revenue_cube(df_obj.prefetch())
+        # Only a cube built from this version's tables goes under its manifest;
+        # CSVs refreshed during the build are left for the next version.
+        if df_obj.data_version == data_version == get_data_version():
+            write_derived_table(CUBE_NAME, df_cube, data_version, cache_path)
+    return df_cube
+
+@cache_resource(max_entries=KEEP_VERSIONS)
+def init_get_revenue_cube(data_version: str)-> pd.DataFrame:
+    return load_revenue_cube(init_get_catalog(data_version).project(CUBE_COLUMNS), data_version)
+
+def slice_cube(
+        df_cube: pd.DataFrame,
+        dimensions: list[str],
+        filters: dict[str, list] | None = None,
+        measures: list[str] = CUBE_MEASURES
+    )-> pd.DataFrame:
+    if filters:
+        mask = pd.Series(True, index=df_cube.index)
+        for dimension, values in filters.items():
+            mask &= df_cube[dimension].isin(values)
+        df_cube = df_cube[mask]
+    return df_cube.groupby(dimensions, observed=True)[measures].sum().reset_index()
+
+def growth_by(
+        df_cube: pd.DataFrame,
+        dimension: str,
+        from_year: int = 2017,
+        to_year: int = 2018,
+        measure: str = 'price'
+    )-> pd.DataFrame:
+    df_growth = df_cube.groupby([dimension, 'year'], observed=True)[measure].sum().unstack('year')
+    df_growth = df_growth.reindex(columns=[from_year, to_year]).reset_index()
+    df_growth.columns.name = None
+    df_growth['tendency'] = df_growth[to_year] - df_growth[from_year]
+    return df_growth
@@ -0,0 +1,148 @@
+from typing import Protocol
+import numpy as np
+import pandas as pd
+from olist.config import QUERY_ENGINE, QUERY_ENGINE_THREADS
+from olist.keys import MISSING_KEY, join_columns
+from olist.profiling import cache_resource
+
+# The builders only need three operations: a grouped aggregation, an equi-join
+# that keeps the left rows in order, and a lookup by surrogate key (the row
+# position in the right table). pandas is the reference implementation.
+
+class QueryEngine(Protocol):
+    name: str
+
+    def aggregate(self, df: pd.DataFrame, by: list[str], aggs: dict[str, str])-> pd.DataFrame: ...
+
+    def join(self, df_left: pd.DataFrame, df_right: pd.DataFrame, on: str)-> pd.DataFrame: ...
+
+    def lookup(self, df_left: pd.DataFrame, key_column: str, df_right: pd.DataFrame, columns: list[str])-> pd.DataFrame: ...
+
+class PandasEngine:
+    name = 'pandas'
+
+    def __init__(self, threads: int | None = None):
+        # pandas runs on one core, threads is accepted for a uniform constructor.
+        pass
+
+    def aggregate(self, df: pd.DataFrame, by: list[str], aggs: dict[str, str])-> pd.DataFrame:
+        return df.groupby(by, observed=True).agg(aggs).reset_index()
+
+    def join(self, df_left: pd.DataFrame, df_right: pd.DataFrame, on: str)-> pd.DataFrame:
+        return df_left.merge(df_right, on=on, how='left')
+
+    def lookup(self, df_left: pd.DataFrame, key_column: str, df_right: pd.DataFrame, columns: list[str])-> pd.DataFrame:
+        keys = df_left[key_column].fillna(MISSING_KEY).to_numpy(dtype='int64')
+        return df_left.assign(**join_columns(df_right, keys, columns))
+
+class DuckDBEngine:
+    name = 'duckdb'
+
+    def __init__(self, threads: int | None = None):
+        # Optional dependency (the duckdb extra), only imported when this engine is selected.
+        try:
+            import duckdb
+        except ImportError as error:
+            raise ImportError('OLIST_ENGINE=duckdb requer o pacote duckdb: poetry install -E duckdb ou pip install duckdb') from error
+        self.connection = duckdb.connect()
+        if threads:
+            self.connection.execute(f'SET threads = {int(threads)}')
+
+    def _query(self, sql: str, **frames: pd.DataFrame)-> pd.DataFrame:
+        # One cursor per query, so sessions running in parallel do not share state.
+        cursor = self.connection.cursor()
+        try:
+            for name, df in frames.items():
+                cursor.register(name, df)
+            return cursor.execute(sql).df()
+        finally:
+            cursor.close()
+
+    def aggregate(self, df: pd.DataFrame, by: list[str], aggs: dict[str, str])-> pd.DataFrame:
+        expressions = {
+            'sum': 'sum("{0}")',
+            'first': 'first("{0}" ORDER BY __row)',
+            'nunique': 'count(DISTINCT "{0}")',
+            'size': 'count(*)',
+        }
+        keys = ', '.join(f'"{column}"' for column in by)
+        selects = ', '.join(f'{expressions[agg].format(column)} AS "{column}"' for column, agg in aggs.items())
+        not_null = ' AND '.join(f'"{column}" IS NOT NULL' for column in by)
+        df_result = self._query(
+            f'SELECT {keys}, {selects} FROM df_input WHERE {not_null} GROUP BY {keys} ORDER BY {keys}',
+            df_input=df.assign(__row=np.arange(len(df))),
+        )
+        return _restore_dtypes(df_result, df, by)
+
+    def join(self, df_left: pd.DataFrame, df_right: pd.DataFrame, on: str)-> pd.DataFrame:
+        right_columns = ', '.join(f'r."{column}"' for column in df_right.columns if column != on)
+        df_result = self._query(
+            f'SELECT l.* EXCLUDE (__row), {right_columns} FROM df_left l LEFT JOIN df_right r ON l."{on}" = r."{on}" ORDER BY l.__row',
+            df_left=df_left.assign(__row=np.arange(len(df_left))),
+            df_right=df_right,
+        )
+        return _restore_dtypes(df_result, df_left, list(df_left.columns))
+
+    def lookup(self, df_left: pd.DataFrame, key_column: str, df_right: pd.DataFrame, columns: list[str])-> pd.DataFrame:
+        df_right = df_right[columns].assign(**{key_column: np.arange(len(df_right), dtype='int32')})
+        return self.join(df_left, df_right, key_column)
+
+def _restore_dtypes(df_result: pd.DataFrame, df_source: pd.DataFrame, columns: list[str])-> pd.DataFrame:
+    # DuckDB widens small integer keys; the reference engine keeps the source dtypes.
+    for column in columns:
+        if column in df_result and df_result[column].dtype != df_source[column].dtype and not df_result[column].isna().any():
+            df_result[column] = df_result[column].astype(df_source[column].dtype)
+    return df_result
+
+QUERY_ENGINES = {
+    'pandas': PandasEngine,
+    'duckdb': DuckDBEngine,
+}
+
+def create_engine(name: str = QUERY_ENGINE, threads: int | None = QUERY_ENGINE_THREADS)-> QueryEngine:
+    if name not in QUERY_ENGINES:
+        raise ValueError(f'Engine de consulta desconhecida: {name}')
+    return QUERY_ENGINES[name](threads)
+
+@cache_resource
+def init_get_engine()-> QueryEngine:
+    return create_engine()
+
+def assert_same_result(df_reference: pd.DataFrame, df_result: pd.DataFrame, rtol: float = 1e-9):
+    # Categories and integer widths may differ between engines, values may not.
+    assert list(df_reference.columns) == list(df_result.columns), (list(df_reference.columns), list(df_result.columns))
+    df_reference = df_reference.reset_index(drop=True)
+    df_result = df_result.reset_index(drop=True)
+    for column in df_reference.columns:
+        reference, result = df_reference[column], df_result[column]
+        if isinstance(reference.dtype, pd.CategoricalDtype) or isinstance(result.dtype, pd.CategoricalDtype):
+            reference, result = reference.astype(object), result.astype(object)
+        pd.testing.assert_series_equal(reference, result, check_dtype=False, rtol=rtol)
+
+if __name__ == '__main__':
+    # Parity check of the configured engine against pandas on the bundled data.
+    import time
+    from olist.loader import OlistCatalog
+    from olist.cube import create_revenue_cube
+    from olist.categories import create_category_dataframe, create_macro_category_dataframe
+    from olist.geo import ZipCentroidIndex, create_geolocation_orders_dataframe, create_geo_categories_dataframe
+
+    df_obj = OlistCatalog()
+    zip_index = ZipCentroidIndex.from_geolocation(df_obj.df_geolocation)
+    df_cube = create_revenue_cube(df_obj)
+    reference, candidate = PandasEngine(), create_engine()
+    builders = {
+        'create_category_dataframe': lambda engine: create_category_dataframe(df_cube, engine),
+        'create_macro_category_dataframe': lambda engine: create_macro_category_dataframe(df_cube, engine),
+        'create_geolocation_orders_dataframe': lambda engine: create_geolocation_orders_dataframe(df_obj, zip_index, engine),
+        'create_geo_categories_dataframe': lambda engine: create_geo_categories_dataframe(df_obj, zip_index, engine),
+    }
+    for name, builder in builders.items():
+        start = time.perf_counter()
+        df_reference = builder(reference)
+        reference_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        df_result = builder(candidate)
+        candidate_seconds = time.perf_counter() - start
+        assert_same_result(df_reference, df_result)
+        print(f'{name}: ok ({reference.name} {reference_seconds:.3f}s, {candidate.name} {candidate_seconds:.3f}s)')
@@ -0,0 +1,240 @@
+import hashlib
+import json
+import sys
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Callable
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+import plotly.io as pio
+from olist.config import FIGURE_CACHE_BYTES
+from olist.categories import create_category_dataframe, create_macro_category_dataframe
+from olist.cube import init_get_revenue_cube, growth_by
+from olist.engine import QueryEngine, init_get_engine
+from olist.taxonomy import MACRO_CATEGORY_COLORS, macro_category_of
+from olist.profiling import cache_resource, count_cache, profiled
+from olist.shared import KEEP_VERSIONS
+
+RENAME_COLUMNS = {
+    "product_macro_category_rename": "Macro_categoria",
+    "product_macro_category": "Categoria",
+    "year": "Ano",
+    "price": "Preco"
+}
+
+class CachedFigure(go.Figure):
+    # A hit served from its JSON spec. st.plotly_chart only reads to_dict, so
+    # the figure is left empty and the spec is decoded on each call; plotly
+    # express and the validation of every animation frame are skipped.
+    def __init__(self, spec: str):
+        super().__init__()
+        self._spec = spec
+
+    def to_dict(self)-> dict:
+        return json.loads(self._spec)
+
+# Figures are kept only as the JSON spec streamlit sends to the browser, and
+# sized by what that string takes in memory.
+@dataclass
+class FigureCache:
+    max_bytes: int = FIGURE_CACHE_BYTES
+    specs: OrderedDict = field(default_factory=OrderedDict)
+    sizes: dict = field(default_factory=dict)
+    size: int = 0
+    hits: int = 0
+    misses: int = 0
+    lock: threading.Lock = field(default_factory=threading.Lock)
+    building: dict = field(default_factory=dict)
+
+    def get(self, key: tuple)-> str | None:
+        with self.lock:
+            spec = self.specs.get(key)
+            if spec is not None:
+                self.specs.move_to_end(key)
+            return spec
+
+    def put(self, key: tuple, spec: str):
+        size = sys.getsizeof(spec)
+        if size > self.max_bytes:
+            return
+        with self.lock:
+            if key in self.specs:
+                del self.specs[key]
+                self.size -= self.sizes.pop(key)
+            self.specs[key] = spec
+            self.sizes[key] = size
+            self.size += size
+            while self.size > self.max_bytes:
+                evicted, _ = self.specs.popitem(last=False)
+                self.size -= self.sizes.pop(evicted)
+
+    def get_or_build(self, key: tuple, build: Callable[[], go.Figure])-> CachedFigure:
+        spec = self.get(key)
+        if spec is None:
+            # One build per key, a page asking for a view being warmed waits for it.
+            with self.lock:
+                key_lock = self.building.setdefault(key, threading.Lock())
+            with key_lock:
+                spec = self.get(key)
+                if spec is None:
+                    spec = pio.to_json(build().to_dict(), validate=False)
+                    self.put(key, spec)
+                    self.misses += 1
+                    count_cache('FigureCache', False)
+                else:
+                    self.hits += 1
+                    count_cache('FigureCache', True)
+            with self.lock:
+                self.building.pop(key, None)
+        else:
+            self.hits += 1
+            count_cache('FigureCache', True)
+        return CachedFigure(spec)
+
+def figure_key(name: str, data_version: str, *params, selected: list | None = None)-> tuple:
+    # The selection only changes which rows are plotted, never their order.
+    digest = None
+    if selected is not None:
+        digest = hashlib.sha1('\x1f'.join(sorted(map(str, selected))).encode()).hexdigest()
+    return (name, data_version, *params, digest)
+
+@profiled
+def category_plot_dataframe(df_cube: pd.DataFrame, show_macro_category: bool, engine: QueryEngine | None = None)-> pd.DataFrame:
+    if show_macro_category:
+        df_plot = create_macro_category_dataframe(df_cube, engine).rename(columns=RENAME_COLUMNS)
+        return df_plot.sort_values(by=['Preco', 'Ano'], ascending=False)
+    return create_category_dataframe(df_cube, engine).rename(columns=RENAME_COLUMNS)
+
+def category_plot_options(df_plot: pd.DataFrame, show_macro_category: bool)-> list:
+    return list(df_plot['Macro_categoria' if show_macro_category else 'Categoria'].unique())
+
+@profiled
+def create_category_figure(
+        df_plot: pd.DataFrame,
+        show_macro_category: bool,
+        group_by_macro_category: bool,
+        display_categories: list
+    )-> go.Figure:
+    max_x = df_plot['Preco'].max()
+
+    if show_macro_category:
+        mask_categories = df_plot['Macro_categoria'].isin(display_categories)
+        df_plot = df_plot[mask_categories]
+        fig = px.bar(
+            df_plot.sort_values(by=['Ano', 'Preco'], ascending=True),
+            y='Macro_categoria',
+            x="Preco",
+            animation_frame="Ano",
+            range_x=[0,max_x*1.05],
+            height=600,
+            color='Macro_categoria',
+            color_discrete_map=MACRO_CATEGORY_COLORS,
+        )
+        fig.update_layout(
+            yaxis={
+                'categoryorder': 'total ascending'
+            }
+        )
+
+    else:
+        mask_categories = df_plot['Categoria'].isin(display_categories)
+        df_plot = df_plot[mask_categories]
+        df_plot = df_plot.sort_values(by=['Ano', 'Preco'], ascending=True)
+        fig = px.bar(
+            df_plot,
+            y='Categoria',
+            x="Preco",
+            animation_frame="Ano",
+            range_x=[0,max_x*1.05],
+            height=1200,
+            hover_data=['Categoria', 'Macro_categoria', 'Preco'],
+            color='Macro_categoria',
+            color_discrete_map=MACRO_CATEGORY_COLORS,
+        )
+        if not group_by_macro_category:
+            fig.update_layout(
+                yaxis={
+                    'categoryorder': 'total ascending'
+                }
+            )
+
+    fig.update_layout(hovermode='y unified')
+    return fig
+
+@profiled
+def create_growth_figure(df_cube: pd.DataFrame, show_macro_category: bool)-> go.Figure:
+    if show_macro_category:
+        df_pivot_category = growth_by(df_cube, 'product_macro_category')
+        df_pivot_category['product_macro_category_rename'] = macro_category_of(df_pivot_category['product_macro_category'])
+        fig = px.bar(
+            data_frame=df_pivot_category,
+            y='product_macro_category',
+            x='tendency',
+            orientation='h',
+            height=1200,
+            color='product_macro_category_rename',
+            color_discrete_map=MACRO_CATEGORY_COLORS,
+        )
+    else:
+        df_pivot_macro_category = growth_by(df_cube, 'product_macro_category_rename')
+        fig = px.bar(
+            data_frame=df_pivot_macro_category,
+            y='product_macro_category_rename',
+            x='tendency',
+            orientation='h',
+            height=800,
+            color='product_macro_category_rename',
+            color_discrete_map=MACRO_CATEGORY_COLORS,
+        )
+    fig.update_layout(
+        yaxis={
+            'categoryorder': 'total ascending'
+        }
+    )
+    return fig
+
+def category_figure(
+        cache: FigureCache,
+        data_version: str,
+        df_plot: pd.DataFrame,
+        show_macro_category: bool,
+        group_by_macro_category: bool,
+        display_categories: list
+    )-> go.Figure:
+    # The grouping toggle is not shown, and has no effect, on the macro view.
+    group_by_macro_category = group_by_macro_category and not show_macro_category
+    key = figure_key('category', data_version, show_macro_category, group_by_macro_category, selected=display_categories)
+    return cache.get_or_build(
+        key,
+        lambda: create_category_figure(df_plot, show_macro_category, group_by_macro_category, display_categories)
+    )
+
+def growth_figure(cache: FigureCache, data_version: str, df_cube: pd.DataFrame, show_macro_category: bool)-> go.Figure:
+    key = figure_key('growth', data_version, show_macro_category)
+    return cache.get_or_build(key, lambda: create_growth_figure(df_cube, show_macro_category))
+
+def warm_figure_cache(cache: FigureCache, data_version: str, df_cube: pd.DataFrame, engine: QueryEngine):
+    # Default views first, in the order a first visit reaches them.
+    for show_macro_category in [False, True]:
+        df_plot = category_plot_dataframe(df_cube, show_macro_category, engine)
+        options = category_plot_options(df_plot, show_macro_category)
+        for group_by_macro_category in ([False] if show_macro_category else [False, True]):
+            category_figure(cache, data_version, df_plot, show_macro_category, group_by_macro_category, options)
+    for show_macro_category in [False, True]:
+        growth_figure(cache, data_version, df_cube, show_macro_category)
+
+@cache_resource(max_entries=KEEP_VERSIONS)
+def init_get_figure_cache(data_version: str)-> FigureCache:
+    cache = FigureCache()
+    # Resolved here, on the script thread, so the warm-up never touches streamlit.
+    df_cube = init_get_revenue_cube(data_version)
+    engine = init_get_engine()
+    threading.Thread(
+        target=warm_figure_cache,
+        args=(cache, data_version, df_cube, engine),
+        name='figure-cache-warmup',
+        daemon=True,
+    ).start()
+    return cache
@@ -0,0 +1,99 @@
+from collections import OrderedDict
+from dataclasses import dataclass, field
+import threading
+import numpy as np
+import pandas as pd
+from olist.config import is_streaming
+from olist.loader import init_get_catalog
+from olist.streaming import stream_geo_aggregates
+from olist.shared import KEEP_VERSIONS, read_shared_table
+from olist.geo import ENRICHED_GEO_NAME, GEO_CATEGORIES_COLUMNS, create_enriched_geo_orders_dataframe, init_get_stream_aggregates, init_get_zip_centroid_index
+from olist.ranking import RANK_COLUMNS, descending_order, top_k_positions
+from olist.profiling import cache_resource, count_cache, profiled
+
+FILTER_COLUMNS = ['year', 'region', 'customer_state', 'product_macro_category_rename']
+MAX_CACHED_MASKS = 64
+
+@dataclass
+class FilterIndex:
+    df: pd.DataFrame
+    codes: dict[str, np.ndarray]
+    values: dict[str, pd.Index]
+    rank_orders: dict[str, np.ndarray] = field(default_factory=dict)
+    # The index is a shared resource, so every session's reruns go through this cache.
+    _mask_cache: OrderedDict[tuple, np.ndarray] = field(default_factory=OrderedDict, repr=False)
+    _mask_lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, columns: list[str] = FILTER_COLUMNS)-> 'FilterIndex':
+        if not df.index.equals(pd.RangeIndex(len(df))):
+            # reset_index copies, which would detach a frame from the shared store.
+            df = df.reset_index(drop=True)
+        codes = {}
+        values = {}
+        for column in columns:
+            column_codes, column_values = pd.factorize(df[column])
+            codes[column] = column_codes
+            values[column] = pd.Index(column_values)
+        rank_orders = {column: descending_order(df[column].to_numpy()) for column in RANK_COLUMNS if column in df}
+        return cls(df=df, codes=codes, values=values, rank_orders=rank_orders)
+
+    def options(self, column: str)-> list:
+        return self.values[column].tolist()
+
+    def mask(self, column: str, selected: list)-> np.ndarray:
+        # One mask per (column, selection) is kept, so changing one widget only
+        # recomputes that column's mask and the final intersection.
+        key = (column, frozenset(selected))
+        with self._mask_lock:
+            mask = self._mask_cache.get(key)
+            if mask is not None:
+                self._mask_cache.move_to_end(key)
+        count_cache('FilterIndex.mask', mask is not None)
+        if mask is None:
+            lookup = np.zeros(len(self.values[column]) + 1, dtype=bool)
+            positions = self.values[column].get_indexer(list(selected))
+            lookup[positions[positions >= 0]] = True
+            mask = lookup[self.codes[column]]
+            with self._mask_lock:
+                self._mask_cache[key] = mask
+                while len(self._mask_cache) > MAX_CACHED_MASKS:
+                    self._mask_cache.popitem(last=False)
+        return mask
+
+    @profiled
+    def select_mask(self, filters: dict[str, list])-> np.ndarray:
+        mask = np.ones(len(self.df), dtype=bool)
+        for column, selected in filters.items():
+            mask &= self.mask(column, selected)
+        return mask
+
+    def ranked_positions(self, mask: np.ndarray, metric: str | None, start: int, stop: int)-> np.ndarray:
+        if metric is None:
+            return np.flatnonzero(mask)[start:stop]
+        if metric in self.rank_orders:
+            # The presorted order filtered by the mask stays sorted, no sort needed.
+            order = self.rank_orders[metric]
+            return order[mask[order]][start:stop]
+        positions = np.flatnonzero(mask)
+        return positions[top_k_positions(self.df[metric].to_numpy()[positions], start, stop)]
+
+    @profiled
+    def ranked_window(self, mask: np.ndarray, metric: str | None, start: int, stop: int)-> pd.DataFrame:
+        return self.df.iloc[self.ranked_positions(mask, metric, start, stop)]
+
+    def select(self, filters: dict[str, list])-> pd.DataFrame:
+        return self.df[self.select_mask(filters)]
+
+@cache_resource(max_entries=KEEP_VERSIONS)
+def init_get_geo_filter_index(data_version: str)-> FilterIndex:
+    if is_streaming():
+        zip_index = init_get_zip_centroid_index(data_version)
+        return FilterIndex.from_frame(stream_geo_aggregates(init_get_stream_aggregates(data_version), zip_index))
+    df_geolocation_orders = read_shared_table(ENRICHED_GEO_NAME, data_version)
+    if df_geolocation_orders is None:
+        df_geolocation_orders = create_enriched_geo_orders_dataframe(
+            init_get_catalog(data_version).project(GEO_CATEGORIES_COLUMNS).prefetch(),
+            init_get_zip_centroid_index(data_version)
+        )
+    return FilterIndex.from_frame(df_geolocation_orders)
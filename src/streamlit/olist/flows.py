@@ -0,0 +1,102 @@
+import pandas as pd
+from olist.config import is_streaming
+from olist.loader import OlistCatalog, init_get_catalog
+from olist.cache import CACHE_PATH, get_data_version, read_derived_table, write_derived_table
+from olist.cube import slice_cube
+from olist.engine import QueryEngine, init_get_engine
+from olist.geo import ZipCentroidIndex, init_get_stream_aggregates, init_get_zip_centroid_index
+from olist.spatial import haversine_km
+from olist.streaming import stream_od_matrix
+from olist.taxonomy import macro_category_of
+from olist.profiling import cache_resource, profiled
+from olist.shared import KEEP_VERSIONS
+
+OD_MATRIX_NAME = 'od_matrix'
+
+# Origin-destination matrix: one row per corridor (seller state -> customer
+# state), year and macro category. Distances are between the seller's and the
+# customer's zip centroids (see ZipCentroidIndex.lookup_nearest); items whose
+# zip sector has no coordinates at all are left out.
+OD_DIMENSIONS = ['seller_state', 'customer_state', 'year', 'product_macro_category_rename']
+OD_MEASURES = ['item_count', 'price', 'freight_value', 'distance_km']
+CORRIDOR_DIMENSIONS = ['seller_state', 'customer_state']
+
+FLOW_COLUMNS = {
+    'df_order_items': ['order_key', 'product_key', 'seller_key', 'price', 'freight_value'],
+    'df_orders': ['customer_key', 'year'],
+    'df_customers': ['customer_zip_code_prefix', 'customer_state'],
+    'df_sellers': ['seller_zip_code_prefix', 'seller_state'],
+    'df_products': ['product_macro_category'],
+}
+
+@profiled
+def create_flow_items_dataframe(
+        df_obj: OlistCatalog,
+        zip_index: ZipCentroidIndex,
+        engine: QueryEngine | None = None
+    )-> pd.DataFrame:
+    engine = engine or init_get_engine()
+    df_flow = df_obj.df_order_items[FLOW_COLUMNS['df_order_items']].reset_index(drop=True)
+    df_flow = engine.lookup(df_flow, 'order_key', df_obj.df_orders, ['customer_key', 'year'])
+    df_flow = engine.lookup(df_flow, 'customer_key', df_obj.df_customers, ['customer_zip_code_prefix', 'customer_state'])
+    df_flow = engine.lookup(df_flow, 'seller_key', df_obj.df_sellers, ['seller_zip_code_prefix', 'seller_state'])
+    df_flow = engine.lookup(df_flow, 'product_key', df_obj.df_products, ['product_macro_category'])
+    customer_lat, customer_lng = zip_index.lookup_nearest(df_flow['customer_zip_code_prefix'].to_numpy())
+    seller_lat, seller_lng = zip_index.lookup_nearest(df_flow['seller_zip_code_prefix'].to_numpy())
+    df_flow['distance_km'] = haversine_km(seller_lat, seller_lng, customer_lat, customer_lng)
+    df_flow['product_macro_category_rename'] = macro_category_of(df_flow['product_macro_category'])
+    return df_flow
+
+@profiled
+def create_od_matrix(df_flow: pd.DataFrame, engine: QueryEngine | None = None)-> pd.DataFrame:
+    engine = engine or init_get_engine()
+    df_flow = df_flow.dropna(subset=['distance_km', 'year']).assign(item_count=1)
+    agg_dict = {
+        'item_count': 'size',
+        'price': 'sum',
+        'freight_value': 'sum',
+        'distance_km': 'sum',
+    }
+    df_od = engine.aggregate(df_flow[[*OD_DIMENSIONS, *OD_MEASURES]], OD_DIMENSIONS, agg_dict)
+    return df_od.astype({
+        'seller_state': 'category',
+        'customer_state': 'category',
+        'year': 'int16',
+        'item_count': 'int32',
+    })
+
+def load_od_matrix(
+        df_obj: OlistCatalog,
+        zip_index: ZipCentroidIndex,
+        data_version: str,
+        cache_path: str = CACHE_PATH
+    )-> pd.DataFrame:
+    df_od = read_derived_table(OD_MATRIX_NAME, data_version, cache_path)
+    if df_od is None:
+        if is_streaming():
+            df_od = stream_od_matrix(init_get_stream_aggregates(data_version))
+        else:
+            df_od = create_od_matrix(create_flow_items_dataframe(df_obj.prefetch(), zip_index))
+        # As for the revenue cube, only a matrix built from this version's
+        # tables goes under its manifest.
+        if df_obj.data_version == data_version == get_data_version():
+            write_derived_table(OD_MATRIX_NAME, df_od, data_version, cache_path)
+    return df_od
+
+@cache_resource(max_entries=KEEP_VERSIONS)
+def init_get_od_matrix(data_version: str)-> pd.DataFrame:
+    return load_od_matrix(init_get_catalog(data_version).project(FLOW_COLUMNS), init_get_zip_centroid_index(data_version), data_version)
+
+def corridor_summary(
+        df_od: pd.DataFrame,
+        filters: dict[str, list] | None = None,
+        dimensions: list[str] = CORRIDOR_DIMENSIONS
+    )-> pd.DataFrame:
+    # Ratios are taken over the summed measures, so every item weighs the same.
+    df_corridors = slice_cube(df_od, dimensions, filters, OD_MEASURES)
+    distance = df_corridors['distance_km'].where(df_corridors['distance_km'] > 0)
+    df_corridors['freight_per_km'] = df_corridors['freight_value'] / distance
+    df_corridors['mean_distance_km'] = df_corridors['distance_km'] / df_corridors['item_count']
+    df_corridors['mean_freight'] = df_corridors['freight_value'] / df_corridors['item_count']
+    df_corridors['freight_share'] = df_corridors['freight_value'] / df_corridors['price'].where(df_corridors['price'] > 0)
+    return df_corridors
@@ -0,0 +1,212 @@
+from dataclasses import dataclass
+import numpy as np
+import pandas as pd
+from olist.config import is_streaming
+from olist.loader import OlistCatalog, init_get_catalog
+from olist.streaming import StreamedAggregates, stream_aggregates, stream_zip_centroid_sums
+from olist.engine import QueryEngine, init_get_engine
+from olist.taxonomy import macro_category_of, region_of
+from olist.profiling import cache_resource, profiled
+from olist.shared import KEEP_VERSIONS
+
+@dataclass(frozen=True)
+class ZipCentroidIndex:
+    zip_prefixes: np.ndarray
+    lat: np.ndarray
+    lng: np.ndarray
+    point_count: np.ndarray
+    lat_std: np.ndarray
+    lng_std: np.ndarray
+
+    @classmethod
+    def from_geolocation(cls, df_geolocation: pd.DataFrame)-> 'ZipCentroidIndex':
+        zip_codes = df_geolocation['geolocation_zip_code_prefix'].to_numpy()
+        lat = df_geolocation['geolocation_lat'].to_numpy(dtype='float64')
+        lng = df_geolocation['geolocation_lng'].to_numpy(dtype='float64')
+
+        zip_prefixes, inverse, point_count = np.unique(zip_codes, return_inverse=True, return_counts=True)
+        lat_mean = np.bincount(inverse, weights=lat) / point_count
+        lng_mean = np.bincount(inverse, weights=lng) / point_count
+        lat_var = np.bincount(inverse, weights=(lat - lat_mean[inverse]) ** 2) / point_count
+        lng_var = np.bincount(inverse, weights=(lng - lng_mean[inverse]) ** 2) / point_count
+        return cls(
+            zip_prefixes=zip_prefixes,
+            lat=lat_mean,
+            lng=lng_mean,
+            point_count=point_count,
+            lat_std=np.sqrt(lat_var),
+            lng_std=np.sqrt(lng_var),
+        )
+
+    @classmethod
+    def from_sums(cls, df_sums: pd.DataFrame)-> 'ZipCentroidIndex':
+        # Built from running sums, as kept by the streaming mode.
+        point_count = df_sums['point_count'].to_numpy(dtype='int64')
+        lat_mean = df_sums['lat'].to_numpy() / point_count
+        lng_mean = df_sums['lng'].to_numpy() / point_count
+        lat_var = np.maximum(df_sums['lat_sq'].to_numpy() / point_count - lat_mean ** 2, 0)
+        lng_var = np.maximum(df_sums['lng_sq'].to_numpy() / point_count - lng_mean ** 2, 0)
+        return cls(
+            zip_prefixes=df_sums['geolocation_zip_code_prefix'].to_numpy(),
+            lat=lat_mean,
+            lng=lng_mean,
+            point_count=point_count,
+            lat_std=np.sqrt(lat_var),
+            lng_std=np.sqrt(lng_var),
+        )
+
+    def __len__(self)-> int:
+        return len(self.zip_prefixes)
+
+    def positions(self, zip_prefixes)-> tuple[np.ndarray, np.ndarray]:
+        zip_prefixes = np.asarray(zip_prefixes)
+        if len(self.zip_prefixes) == 0:
+            return np.zeros(len(zip_prefixes), dtype='intp'), np.zeros(len(zip_prefixes), dtype=bool)
+        positions = np.searchsorted(self.zip_prefixes, zip_prefixes)
+        positions = np.minimum(positions, len(self.zip_prefixes) - 1)
+        found = self.zip_prefixes[positions] == zip_prefixes
+        return positions, found
+
+    def lookup(self, zip_prefixes)-> tuple[np.ndarray, np.ndarray]:
+        positions, found = self.positions(zip_prefixes)
+        if len(self.zip_prefixes) == 0:
+            return np.full(len(found), np.nan), np.full(len(found), np.nan)
+        lat = np.where(found, self.lat[positions], np.nan)
+        lng = np.where(found, self.lng[positions], np.nan)
+        return lat, lng
+
+    def lookup_nearest(self, zip_prefixes, sector_size: int = 100)-> tuple[np.ndarray, np.ndarray]:
+        # Prefixes missing from the geolocation export take the centroid of the
+        # closest known prefix of the same sector (first three digits).
+        zip_prefixes = np.asarray(zip_prefixes, dtype='float64')
+        if len(self.zip_prefixes) == 0:
+            return np.full(len(zip_prefixes), np.nan), np.full(len(zip_prefixes), np.nan)
+        valid = ~np.isnan(zip_prefixes)
+        zip_codes = np.where(valid, zip_prefixes, -1).astype('int64')
+        known = self.zip_prefixes.astype('int64')
+        right = np.minimum(np.searchsorted(known, zip_codes), len(known) - 1)
+        left = np.maximum(right - 1, 0)
+        nearest = np.where(np.abs(known[left] - zip_codes) < np.abs(known[right] - zip_codes), left, right)
+        found = valid & (known[nearest] // sector_size == zip_codes // sector_size)
+        lat = np.where(found, self.lat[nearest], np.nan)
+        lng = np.where(found, self.lng[nearest], np.nan)
+        return lat, lng
+
+    def attach(
+            self,
+            df: pd.DataFrame,
+            zip_column: str,
+            lat_column: str = 'geolocation_lat',
+            lng_column: str = 'geolocation_lng'
+        )-> pd.DataFrame:
+        lat, lng = self.lookup(df[zip_column].to_numpy())
+        return df.assign(**{lat_column: lat, lng_column: lng})
+
+    def attach_customers(self, df: pd.DataFrame)-> pd.DataFrame:
+        return self.attach(df, 'customer_zip_code_prefix')
+
+GEOLOCATION_COLUMNS = ['geolocation_zip_code_prefix', 'geolocation_lat', 'geolocation_lng']
+
+# Keyed by data version, so a refreshed dataset or a newly published shared
+# store gets its own index and the previous version's mapping is released.
+@cache_resource(max_entries=KEEP_VERSIONS)
+def init_get_zip_centroid_index(data_version: str)-> ZipCentroidIndex:
+    if is_streaming():
+        return ZipCentroidIndex.from_sums(stream_zip_centroid_sums())
+    return ZipCentroidIndex.from_geolocation(init_get_catalog(data_version).table('df_geolocation', GEOLOCATION_COLUMNS))
+
+# The streamed cube, geo totals and OD matrix all come out of this one pass
+# over the order items, shared by the pages that decode them.
+@cache_resource(max_entries=KEEP_VERSIONS)
+def init_get_stream_aggregates(data_version: str)-> StreamedAggregates:
+    return stream_aggregates(init_get_zip_centroid_index(data_version))
+
+@profiled
+def create_geolocation_orders_dataframe(
+        df_obj: OlistCatalog,
+        zip_index: ZipCentroidIndex,
+        engine: QueryEngine | None = None
+    )-> pd.DataFrame:
+    engine = engine or init_get_engine()
+    mask_2017_2018 = df_obj.df_orders['year'].between(2017,2018)
+    orders_columns = ['order_id', 'order_key', 'customer_id', 'customer_key', 'year']
+    agg_dict = {
+        'price': 'sum',
+        'freight_value': 'sum'
+    }
+    df_order_prices = engine.aggregate(df_obj.df_order_items[['order_key', 'price', 'freight_value']], ['order_key'], agg_dict)
+
+    df_geolocation_orders = df_obj.df_orders.loc[mask_2017_2018, orders_columns].reset_index(drop=True)
+    df_geolocation_orders = engine.lookup(df_geolocation_orders, 'customer_key', df_obj.df_customers, ['customer_zip_code_prefix'])
+    df_geolocation_orders = engine.join(df_geolocation_orders, df_order_prices, 'order_key')
+    df_geolocation_orders = zip_index.attach_customers(df_geolocation_orders)
+
+    return df_geolocation_orders
+
+GEO_CATEGORIES_COLUMNS = {
+    'df_order_items': ['order_id', 'order_key', 'product_id', 'product_key', 'price', 'freight_value'],
+    'df_products': ['product_macro_category'],
+    'df_orders': ['customer_id', 'customer_key', 'year'],
+    'df_customers': ['customer_zip_code_prefix', 'customer_state'],
+}
+
+@profiled
+def create_geo_categories_dataframe(
+        df_obj: OlistCatalog,
+        zip_index: ZipCentroidIndex,
+        engine: QueryEngine | None = None
+    )-> pd.DataFrame:
+    engine = engine or init_get_engine()
+    order_items_columns = GEO_CATEGORIES_COLUMNS['df_order_items']
+
+    # Items -> products and items -> orders -> customers, joined on surrogate keys.
+    df_geolocation_categories = df_obj.df_order_items[order_items_columns].reset_index(drop=True)
+    df_geolocation_categories = engine.lookup(df_geolocation_categories, 'product_key', df_obj.df_products, ['product_macro_category'])
+    df_geolocation_categories = engine.lookup(df_geolocation_categories, 'order_key', df_obj.df_orders, ['customer_id', 'year', 'customer_key'])
+    df_geolocation_categories = engine.lookup(df_geolocation_categories, 'customer_key', df_obj.df_customers, ['customer_zip_code_prefix', 'customer_state'])
+    df_geolocation_categories = zip_index.attach_customers(df_geolocation_categories)
+    df_geolocation_categories['product_macro_category_rename'] = macro_category_of(df_geolocation_categories['product_macro_category'])
+    return df_geolocation_categories
+
+ENRICHED_GEO_NAME = 'enriched_geo_orders'
+
+# Only what the Localização page reads is kept: hex ids give way to their int32
+# surrogate keys, coordinates are float32 and strings categoricals. Colours are
+# added at render time.
+ENRICHED_GEO_COLUMNS = [
+    'order_key',
+    'customer_key',
+    'product_key',
+    'year',
+    'customer_zip_code_prefix',
+    'customer_state',
+    'region',
+    'product_macro_category',
+    'product_macro_category_rename',
+    'price',
+    'freight_value',
+    'geolocation_lat',
+    'geolocation_lng',
+]
+
+@profiled
+def create_enriched_geo_orders_dataframe(
+        df_obj: OlistCatalog,
+        zip_index: ZipCentroidIndex,
+        engine: QueryEngine | None = None
+    )-> pd.DataFrame:
+    df_geolocation_orders = create_geo_categories_dataframe(df_obj, zip_index, engine)
+    df_geolocation_orders = df_geolocation_orders.dropna().reset_index(drop=True)
+    df_geolocation_orders['region'] = region_of(df_geolocation_orders['customer_state'])
+    df_geolocation_orders = df_geolocation_orders[ENRICHED_GEO_COLUMNS].astype({
+        'order_key': 'int32',
+        'customer_key': 'int32',
+        'product_key': 'int32',
+        'year': 'int16',
+        'customer_zip_code_prefix': 'int32',
+        'customer_state': 'category',
+        'product_macro_category': 'category',
+        'geolocation_lat': 'float32',
+        'geolocation_lng': 'float32',
+    })
+    return df_geolocation_orders
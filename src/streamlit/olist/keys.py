@@ -0,0 +1,35 @@
+import numpy as np
+import pandas as pd
+from pandas.api.extensions import take
+
+# Each hex id is owned by the table where it is the primary key. Its surrogate
+# key is the owner's row position, so a foreign key is also a join index.
+KEY_OWNERS: dict[str, tuple[str, str]] = {
+    'order_id': ('df_orders', 'order_key'),
+    'customer_id': ('df_customers', 'customer_key'),
+    'product_id': ('df_products', 'product_key'),
+    'seller_id': ('df_sellers', 'seller_key'),
+}
+
+MISSING_KEY = -1
+
+def encode_keys(owner_ids: pd.Series, ids: pd.Series)-> np.ndarray:
+    # Duplicated owner ids resolve to their first row where a merge would repeat
+    # the match; Olist ids are unique so this only guards against a bad file.
+    first = ~owner_ids.duplicated().to_numpy()
+    rows = np.flatnonzero(first).astype('int32')
+    positions = pd.Index(owner_ids.to_numpy()[first]).get_indexer(ids.to_numpy())
+    return np.where(positions >= 0, rows[positions], MISSING_KEY).astype('int32')
+
+def take_rows(values: pd.Series | np.ndarray, keys: np.ndarray)-> np.ndarray | pd.api.extensions.ExtensionArray:
+    # Missing keys come back as NA, matching a left merge without a match.
+    if isinstance(values, pd.Series):
+        values = values.array if isinstance(values.dtype, pd.api.extensions.ExtensionDtype) else values.to_numpy()
+    return take(values, np.asarray(keys, dtype='intp'), allow_fill=True)
+
+def follow_keys(foreign_keys: pd.Series, keys: np.ndarray)-> np.ndarray:
+    # Chains joins through an intermediate table, e.g. order items -> orders -> customers.
+    return take(foreign_keys.to_numpy(), np.asarray(keys, dtype='intp'), allow_fill=True, fill_value=MISSING_KEY)
+
+def join_columns(df_owner: pd.DataFrame, keys: np.ndarray, columns: list[str])-> dict[str, np.ndarray]:
+    return {column: take_rows(df_owner[column], keys) for column in columns}
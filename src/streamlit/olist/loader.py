@@ -0,0 +1,146 @@
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+import threading
+import time
+import pandas as pd
+from olist.tables import DATA_PATH, TABLE_SPECS
+from olist.cache import CACHE_PATH, load_cached_table
+from olist.config import LOAD_WORKERS
+from olist.keys import KEY_OWNERS, encode_keys
+from olist.profiling import cache_resource
+from olist.shared import KEEP_VERSIONS, current_shared_version, read_shared_table
+
+# Surrogate key column -> hex id column it encodes.
+KEY_COLUMNS = {key_column: id_column for id_column, (_, key_column) in KEY_OWNERS.items()}
+
+@dataclass
+class _TableStore:
+    tables: dict[str, pd.DataFrame] = field(default_factory=dict)
+    complete: set[str] = field(default_factory=set)
+    # One lock per table: different tables load in parallel, and encoding a
+    # foreign key waits only for the owning table.
+    locks: dict[str, threading.Lock] = field(default_factory=lambda: {name: threading.Lock() for name in TABLE_SPECS})
+    timings: dict[str, dict[str, float]] = field(default_factory=dict)
+    # Data version the catalog was opened for, None for ad hoc catalogs.
+    data_version: str | None = None
+    # Published version of the shared store the tables are attached from.
+    shared_version: str | None = None
+
+# Tables load on first attribute access and stay loaded. A projection maps
+# table names to the columns a view reads, so only those are read from the
+# Parquet cache; projections of one catalog share the loaded tables.
+class OlistCatalog:
+    def __init__(
+            self,
+            data_path: str = DATA_PATH,
+            cache_path: str = CACHE_PATH,
+            projections: dict[str, list[str]] | None = None,
+            store: _TableStore | None = None
+        ):
+        self.data_path = data_path
+        self.cache_path = cache_path
+        self.projections = projections or {}
+        self._store = store or _TableStore()
+
+    def __getattr__(self, name: str)-> pd.DataFrame:
+        if name not in TABLE_SPECS:
+            raise AttributeError(name)
+        return self.table(name, self.projections.get(name))
+
+    @property
+    def data_version(self)-> str | None:
+        return self._store.data_version
+
+    def project(self, projections: dict[str, list[str]])-> 'OlistCatalog':
+        return OlistCatalog(self.data_path, self.cache_path, projections, self._store)
+
+    def table(self, name: str, columns: list[str] | None = None)-> pd.DataFrame:
+        # The stored frame is returned as is: it holds at least the requested
+        # columns and may hold more if another view asked for them.
+        store = self._store
+        with store.locks[name]:
+            if name in store.complete:
+                return store.tables[name]
+            if store.shared_version is not None:
+                # Shared tables already hold their keys, and attaching maps the
+                # whole file without reading it, so no projection is needed.
+                start = time.perf_counter()
+                df_shared = read_shared_table(name, store.shared_version)
+                if df_shared is not None:
+                    store.timings[name] = {'load': time.perf_counter() - start, 'keys': 0.0}
+                    store.tables[name] = df_shared
+                    store.complete.add(name)
+                    return df_shared
+            df = store.tables.get(name)
+            if columns is None:
+                missing = None
+            else:
+                loaded = set() if df is None else set(df.columns)
+                source_columns = [KEY_COLUMNS.get(column, column) for column in columns]
+                missing = [column for column in dict.fromkeys(source_columns) if column not in loaded]
+                if not missing:
+                    return df
+
+            start = time.perf_counter()
+            df_loaded = load_cached_table(name, self.data_path, self.cache_path, missing)
+            load_seconds = time.perf_counter() - start
+            if columns is not None and df is not None:
+                df_loaded = pd.concat([df, df_loaded], axis=1)
+            start = time.perf_counter()
+            df_loaded = self._add_keys(name, df_loaded)
+            timing = store.timings.setdefault(name, {'load': 0.0, 'keys': 0.0})
+            timing['load'] += load_seconds
+            timing['keys'] += time.perf_counter() - start
+
+            store.tables[name] = df_loaded
+            if columns is None:
+                store.complete.add(name)
+            return df_loaded
+
+    def _add_keys(self, name: str, df: pd.DataFrame)-> pd.DataFrame:
+        # New keys go on a new frame, frames already handed out are never mutated.
+        keys = {}
+        for id_column, (owner_name, key_column) in KEY_OWNERS.items():
+            if id_column not in df or key_column in df:
+                continue
+            owner_ids = df[id_column] if owner_name == name else self.table(owner_name, [id_column])[id_column]
+            keys[key_column] = encode_keys(owner_ids, df[id_column])
+        return df.assign(**keys) if keys else df
+
+    def prefetch(self, max_workers: int = LOAD_WORKERS)-> 'OlistCatalog':
+        # Loads the projected tables (or all of them) concurrently, so a cold
+        # start waits for the slowest table rather than the sum of all.
+        names = list(self.projections) or list(TABLE_SPECS)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for future in [executor.submit(self.table, name, self.projections.get(name)) for name in names]:
+                future.result()
+        return self
+
+    def load_all(self, max_workers: int = LOAD_WORKERS)-> 'OlistCatalog':
+        return OlistCatalog(self.data_path, self.cache_path, store=self._store).prefetch(max_workers)
+
+    def loaded_tables(self)-> dict[str, pd.DataFrame]:
+        return dict(self._store.tables)
+
+    def timings(self)-> pd.DataFrame:
+        df_timings = pd.DataFrame.from_dict(self._store.timings, orient='index', columns=['load', 'keys'])
+        df_timings['total'] = df_timings.sum(axis=1)
+        return df_timings.rename_axis('table').sort_values('total', ascending=False).reset_index()
+
+def load_datasets(data_path: str = DATA_PATH, cache_path: str = CACHE_PATH)-> OlistCatalog:
+    return OlistCatalog(data_path, cache_path).load_all()
+
+# cache_resource keeps one catalog per data version, shared by every page and
+# session; tables are only read when a view first asks for them. A refreshed
+# dataset gets a new catalog, and a version published in the shared store is
+# attached to its files.
+@cache_resource(max_entries=KEEP_VERSIONS)
+def init_get_catalog(data_version: str)-> OlistCatalog:
+    shared_version = data_version if data_version == current_shared_version() else None
+    return OlistCatalog(store=_TableStore(data_version=data_version, shared_version=shared_version))
+
+if __name__ == '__main__':
+    start = time.perf_counter()
+    df_obj = load_datasets()
+    print(df_obj.timings().round(3).to_string(index=False))
+    print(f'total: {time.perf_counter() - start:.3f}s')
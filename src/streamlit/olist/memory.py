@@ -0,0 +1,34 @@
+import pandas as pd
+from olist.loader import load_datasets
+
+def memory_report(tables: dict[str, pd.DataFrame])-> pd.DataFrame:
+    rows = []
+    for name, df in tables.items():
+        memory = df.memory_usage(deep=True, index=True)
+        rows.append({
+            'table': name,
+            'rows': len(df),
+            'columns': df.shape[1],
+            'memory_mb': round(memory.sum() / 2 ** 20, 2),
+            'bytes_per_row': round(memory.sum() / max(len(df), 1), 1),
+        })
+    return pd.DataFrame(rows).sort_values('memory_mb', ascending=False, ignore_index=True)
+
+def column_memory_report(df: pd.DataFrame)-> pd.DataFrame:
+    memory = df.memory_usage(deep=True, index=False)
+    return pd.DataFrame({
+        'column': memory.index,
+        'dtype': [str(df[column].dtype) for column in memory.index],
+        'memory_mb': (memory.to_numpy() / 2 ** 20).round(3),
+    }).sort_values('memory_mb', ascending=False, ignore_index=True)
+
+if __name__ == '__main__':
+    from olist.geo import ZipCentroidIndex, create_enriched_geo_orders_dataframe
+
+    df_obj = load_datasets()
+    tables = df_obj.loaded_tables()
+    df_geolocation_orders = create_enriched_geo_orders_dataframe(df_obj, ZipCentroidIndex.from_geolocation(df_obj.df_geolocation))
+    tables['df_geolocation_orders'] = df_geolocation_orders
+    print(memory_report(tables).to_string(index=False))
+    print()
+    print(column_memory_report(df_geolocation_orders).to_string(index=False))
@@ -0,0 +1,172 @@
+import functools
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+import streamlit as st
+import numpy as np
+import pandas as pd
+from olist.config import PROFILE_ENABLED, PROFILE_LOG_PATH
+
+# Spans and cache counters of one page rerun. Only the script thread records;
+# work handed to background threads (catalog prefetch, figure warm-up) shows up
+# as the time the script spent waiting for it.
+
+@dataclass
+class RerunProfile:
+    page: str
+    timestamp: float = field(default_factory=time.time)
+    start: float = field(default_factory=time.perf_counter)
+    spans: list[dict] = field(default_factory=list)
+    caches: dict[str, dict[str, int]] = field(default_factory=dict)
+    depth: int = 0
+    seconds: float | None = None
+
+    def count(self, name: str, hit: bool):
+        counter = self.caches.setdefault(name, {'hits': 0, 'misses': 0})
+        counter['hits' if hit else 'misses'] += 1
+
+    def to_record(self)-> dict:
+        return {
+            'page': self.page,
+            'timestamp': round(self.timestamp, 3),
+            'seconds': self.seconds,
+            'rss_mb': round(_rss_bytes() / 2 ** 20, 1),
+            'spans': self.spans,
+            'caches': self.caches,
+        }
+
+_current_profile: ContextVar[RerunProfile | None] = ContextVar('olist_profile', default=None)
+
+def _rss_bytes()-> int:
+    # Resident set size from procfs, 0 where it is not available.
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return 0
+
+def _rows(result, args: tuple)-> int | None:
+    # Rows produced when the stage returns a frame, rows consumed otherwise.
+    if isinstance(result, (pd.DataFrame, pd.Series)):
+        return len(result)
+    if isinstance(result, np.ndarray) and result.dtype == bool:
+        return int(np.count_nonzero(result))
+    for arg in args:
+        if isinstance(arg, pd.DataFrame):
+            return len(arg)
+    return None
+
+@contextmanager
+def span(name: str):
+    profile = _current_profile.get()
+    if profile is None:
+        yield {}
+        return
+    # Appended on entry so nested spans follow their parent.
+    record = {'name': name, 'depth': profile.depth}
+    profile.spans.append(record)
+    profile.depth += 1
+    rss = _rss_bytes()
+    start = time.perf_counter()
+    try:
+        yield record
+    finally:
+        record['seconds'] = round(time.perf_counter() - start, 6)
+        record['memory_mb'] = round((_rss_bytes() - rss) / 2 ** 20, 3)
+        profile.depth -= 1
+
+def profiled(func):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if _current_profile.get() is None:
+            return func(*args, **kwargs)
+        with span(func.__qualname__) as record:
+            result = func(*args, **kwargs)
+            rows = _rows(result, args)
+            if rows is not None:
+                record['rows'] = rows
+            return result
+    return wrapper
+
+def count_cache(name: str, hit: bool):
+    profile = _current_profile.get()
+    if profile is not None:
+        profile.count(name, hit)
+
+def cache_resource(func=None, **cache_kwargs):
+    # st.cache_resource that also counts hits and misses: the decorated body
+    # only runs on a miss.
+    if func is None:
+        return functools.partial(cache_resource, **cache_kwargs)
+    calls = threading.local()
+
+    @functools.wraps(func)
+    def build(*args, **kwargs):
+        calls.missed = True
+        return func(*args, **kwargs)
+
+    cached = st.cache_resource(**cache_kwargs)(build)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if _current_profile.get() is None:
+            return cached(*args, **kwargs)
+        calls.missed = False
+        with span(func.__qualname__) as record:
+            result = cached(*args, **kwargs)
+            rows = _rows(result, ())
+            if rows is not None:
+                record['rows'] = rows
+        count_cache(func.__qualname__, hit=not calls.missed)
+        return result
+
+    wrapper.clear = cached.clear
+    return wrapper
+
+def _profile_logger()-> logging.Logger:
+    logger = logging.getLogger('olist.profile')
+    if not logger.handlers:
+        handler = logging.FileHandler(PROFILE_LOG_PATH) if PROFILE_LOG_PATH else logging.StreamHandler(sys.stderr)
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+    return logger
+
+def start_profile(page: str)-> RerunProfile | None:
+    if not PROFILE_ENABLED:
+        return None
+    profile = RerunProfile(page)
+    _current_profile.set(profile)
+    return profile
+
+def finish_profile(profile: RerunProfile | None):
+    if profile is None:
+        return
+    _current_profile.set(None)
+    profile.seconds = round(time.perf_counter() - profile.start, 6)
+    record = profile.to_record()
+    _profile_logger().info(json.dumps(record, ensure_ascii=False))
+    show_profile(record)
+
+def show_profile(record: dict):
+    with st.sidebar.expander('Perfil da execução', expanded=True):
+        st.write(f"**{record['page']}**: {record['seconds']:.3f}s, RSS {record['rss_mb']} MB")
+        df_spans = pd.DataFrame(record['spans'], columns=['name', 'depth', 'rows', 'seconds', 'memory_mb'])
+        df_spans['name'] = ['· ' * depth + name for name, depth in zip(df_spans['name'], df_spans['depth'])]
+        st.dataframe(df_spans.drop(columns='depth'), hide_index=True)
+        if record['caches']:
+            df_caches = pd.DataFrame.from_dict(record['caches'], orient='index').rename_axis('cache').reset_index()
+            st.dataframe(df_caches, hide_index=True)
+        st.download_button(
+            'Exportar JSON',
+            data=json.dumps(record, ensure_ascii=False, indent=2),
+            file_name='perfil.json',
+            mime='application/json',
+        )
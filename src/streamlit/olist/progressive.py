@@ -0,0 +1,40 @@
+from collections.abc import MutableMapping
+from dataclasses import dataclass
+from olist.config import MAP_BATCH_INTERVAL, MAP_BATCH_SIZE
+
+# Progressive map rendering: the page paints an aggregate of every filtered
+# order first, then a fragment timer sends the ranked points one batch at a
+# time on a layer the map keeps, so the base map is never rebuilt.
+
+@dataclass
+class ProgressiveRender:
+    key: tuple
+    total: int
+    batch_size: int = MAP_BATCH_SIZE
+    loaded: int = 0
+
+    @property
+    def done(self)-> bool:
+        return self.loaded >= self.total
+
+    def advance(self)-> int:
+        self.loaded = min(self.loaded + self.batch_size, self.total)
+        return self.loaded
+
+    def run_every(self, interval: float = MAP_BATCH_INTERVAL)-> float | None:
+        # The next run sends one more batch; the timer is only needed while
+        # batches remain after it.
+        return interval if self.loaded + self.batch_size < self.total else None
+
+def progressive_render(state: MutableMapping, state_key: str, key: tuple, total: int)-> ProgressiveRender:
+    # A new selection replaces the render in flight, which cancels it: its
+    # pending ticks find a different key and stop.
+    render = state.get(state_key)
+    if not isinstance(render, ProgressiveRender) or render.key != key or render.total != total:
+        render = ProgressiveRender(key, total)
+        state[state_key] = render
+    return render
+
+def is_current(state: MutableMapping, state_key: str, key: tuple)-> bool:
+    render = state.get(state_key)
+    return isinstance(render, ProgressiveRender) and render.key == key
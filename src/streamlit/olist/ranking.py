@@ -0,0 +1,19 @@
+import numpy as np
+
+RANK_COLUMNS = ['price', 'freight_value']
+
+def descending_order(values: np.ndarray)-> np.ndarray:
+    return np.argsort(-np.asarray(values, dtype='float64'), kind='stable')
+
+def top_k_positions(values: np.ndarray, start: int, stop: int)-> np.ndarray:
+    # Partial selection: only the first `stop` values are sorted, not all of them.
+    values = -np.asarray(values, dtype='float64')
+    stop = min(stop, len(values))
+    if start >= stop:
+        return np.array([], dtype='int64')
+    if stop < len(values):
+        candidates = np.argpartition(values, stop - 1)[:stop]
+    else:
+        candidates = np.arange(len(values))
+    ranked = candidates[np.argsort(values[candidates], kind='stable')]
+    return ranked[start:stop]
@@ -0,0 +1,103 @@
+import numpy as np
+import pandas as pd
+import folium
+from folium.utilities import JsCode
+from olist.spatial import cell_polygon
+from olist.profiling import profiled
+
+# Styles are read from each feature's properties in the browser, so the page
+# ships one layer and one style function regardless of the number of points.
+FEATURE_STYLE_JS = JsCode("""
+function(feature, layer) {
+    var properties = feature.properties;
+    var style = {
+        fill: true,
+        weight: 0,
+        color: properties.color,
+        fillColor: properties.color,
+        fillOpacity: properties.opacity
+    };
+    if (properties.radius !== undefined) {
+        style.radius = properties.radius;
+    }
+    layer.setStyle(style);
+}
+""")
+
+def _properties(df: pd.DataFrame, columns: list[str])-> list[dict]:
+    df_properties = df[columns].copy()
+    for column in columns:
+        if isinstance(df_properties[column].dtype, pd.CategoricalDtype):
+            df_properties[column] = df_properties[column].astype('object')
+    return df_properties.to_dict('records')
+
+def points_feature_collection(
+        df: pd.DataFrame,
+        property_columns: list[str],
+        lat_column: str = 'geolocation_lat',
+        lng_column: str = 'geolocation_lng'
+    )-> dict:
+    lat = np.round(df[lat_column].to_numpy(dtype='float64'), 5).tolist()
+    lng = np.round(df[lng_column].to_numpy(dtype='float64'), 5).tolist()
+    features = [
+        {
+            'type': 'Feature',
+            'geometry': {'type': 'Point', 'coordinates': [point_lng, point_lat]},
+            'properties': properties,
+        }
+        for point_lat, point_lng, properties in zip(lat, lng, _properties(df, property_columns))
+    ]
+    return {'type': 'FeatureCollection', 'features': features}
+
+def cells_feature_collection(df_cells: pd.DataFrame, cell_size: float, kind: str, property_columns: list[str])-> dict:
+    features = []
+    for cell_lat, cell_lng, properties in zip(df_cells['cell_lat'], df_cells['cell_lng'], _properties(df_cells, property_columns)):
+        ring = [[round(lng, 5), round(lat, 5)] for lat, lng in cell_polygon(cell_lat, cell_lng, cell_size, kind)]
+        features.append({
+            'type': 'Feature',
+            'geometry': {'type': 'Polygon', 'coordinates': [ring + ring[:1]]},
+            'properties': properties,
+        })
+    return {'type': 'FeatureCollection', 'features': features}
+
+@profiled
+def add_points_layer(
+        mapa: folium.Map | folium.FeatureGroup,
+        df: pd.DataFrame,
+        popup_fields: list[str],
+        popup_aliases: list[str],
+        tooltip_field: str,
+        name: str = 'Pedidos'
+    )-> folium.GeoJson:
+    property_columns = list(dict.fromkeys(['radius', 'color', 'opacity', tooltip_field, *popup_fields]))
+    layer = folium.GeoJson(
+        points_feature_collection(df, property_columns),
+        name=name,
+        marker=folium.CircleMarker(),
+        on_each_feature=FEATURE_STYLE_JS,
+        tooltip=folium.GeoJsonTooltip(fields=[tooltip_field], labels=False),
+        popup=folium.GeoJsonPopup(fields=popup_fields, aliases=popup_aliases),
+    )
+    layer.add_to(mapa)
+    return layer
+
+@profiled
+def add_cells_layer(
+        mapa: folium.Map,
+        df_cells: pd.DataFrame,
+        cell_size: float,
+        kind: str,
+        popup_fields: list[str],
+        popup_aliases: list[str],
+        name: str = 'Células'
+    )-> folium.GeoJson:
+    property_columns = list(dict.fromkeys(['color', 'opacity', *popup_fields]))
+    layer = folium.GeoJson(
+        cells_feature_collection(df_cells, cell_size, kind, property_columns),
+        name=name,
+        on_each_feature=FEATURE_STYLE_JS,
+        tooltip=folium.GeoJsonTooltip(fields=popup_fields[:1], aliases=popup_aliases[:1]),
+        popup=folium.GeoJsonPopup(fields=popup_fields, aliases=popup_aliases),
+    )
+    layer.add_to(mapa)
+    return layer
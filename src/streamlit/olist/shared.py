@@ -0,0 +1,143 @@
+import json
+import os
+import shutil
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc as ipc
+from olist.config import SHARED_STORE_PATH
+
+# One loader process writes the cleaned tables (with their surrogate keys) and
+# the page frames as uncompressed Arrow IPC files under <store>/<version>/.
+# Server processes memory-map them read-only: columns are views over the
+# mapping, so every worker shares the same pages of the OS page cache.
+# <store>/CURRENT names the published version and is swapped atomically.
+
+CURRENT_FILE = 'CURRENT'
+KEEP_VERSIONS = 2
+
+def _column_array(series: pd.Series)-> tuple[pa.Array, dict]:
+    dtype = series.dtype
+    if isinstance(dtype, pd.CategoricalDtype):
+        meta = {'kind': 'category', 'categories': dtype.categories.tolist(), 'ordered': bool(dtype.ordered)}
+        return pa.array(series.cat.codes.to_numpy()), meta
+    if isinstance(dtype, np.dtype) and dtype.kind == 'M':
+        return pa.array(series.to_numpy().view('int64')), {'kind': 'datetime', 'dtype': str(dtype)}
+    if dtype == object or isinstance(dtype, pd.StringDtype):
+        return pa.array(series, type=pa.large_string(), from_pandas=True), {'kind': 'string'}
+    if isinstance(dtype, np.dtype) and dtype.kind in 'biuf':
+        # NaN is kept as a value, not a null, so reading needs no mask.
+        return pa.array(series.to_numpy()), {'kind': 'numeric'}
+    raise ValueError(f'Tipo sem suporte no store compartilhado: {series.name} ({dtype})')
+
+def _column_values(column: pa.ChunkedArray, meta: dict):
+    if meta['kind'] == 'string':
+        return pd.arrays.ArrowStringArray(column)
+    array = column.chunk(0) if column.num_chunks == 1 else column.combine_chunks()
+    values = array.to_numpy(zero_copy_only=True)
+    if meta['kind'] == 'category':
+        dtype = pd.CategoricalDtype(meta['categories'], ordered=meta['ordered'])
+        return pd.Categorical.from_codes(values, dtype=dtype, validate=False)
+    if meta['kind'] == 'datetime':
+        return values.view(meta['dtype'])
+    return values
+
+def write_shared_table(df: pd.DataFrame, path: str):
+    arrays, fields = [], []
+    for column in df.columns:
+        array, meta = _column_array(df[column])
+        arrays.append(array)
+        fields.append(pa.field(str(column), array.type, metadata={'olist': json.dumps(meta)}))
+    table = pa.Table.from_arrays(arrays, schema=pa.schema(fields))
+    with pa.OSFile(path, 'wb') as sink:
+        with ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+
+def attach_shared_table(path: str, columns: list[str] | None = None)-> pd.DataFrame:
+    table = ipc.open_file(pa.memory_map(path, 'r')).read_all()
+    data = {}
+    for name in columns or table.column_names:
+        meta = json.loads(table.schema.field(name).metadata[b'olist'])
+        data[name] = _column_values(table.column(name), meta)
+    # copy=False keeps one block per column, each a view of the mapping.
+    return pd.DataFrame(data, copy=False)
+
+def current_shared_version(store_path: str | None = SHARED_STORE_PATH)-> str | None:
+    if store_path is None:
+        return None
+    try:
+        with open(f'{store_path}/{CURRENT_FILE}') as file:
+            return json.load(file)['version']
+    except (OSError, ValueError, KeyError):
+        return None
+
+def read_shared_table(
+        name: str,
+        version: str | None,
+        store_path: str | None = SHARED_STORE_PATH,
+        columns: list[str] | None = None
+    )-> pd.DataFrame | None:
+    if store_path is None or version is None:
+        return None
+    path = f'{store_path}/{version}/{name}.arrow'
+    if not os.path.exists(path):
+        return None
+    return attach_shared_table(path, columns)
+
+def _prune_versions(store_path: str, current: str, keep: int = KEEP_VERSIONS):
+    # Workers still mapping a removed version keep reading it until they swap.
+    versions = [
+        entry for entry in os.scandir(store_path)
+        if entry.is_dir() and '.tmp' not in entry.name and entry.name != current
+    ]
+    versions.sort(key=lambda entry: entry.stat().st_mtime, reverse=True)
+    for entry in versions[keep - 1:]:
+        shutil.rmtree(entry.path, ignore_errors=True)
+
+def publish_shared_store(tables: dict[str, pd.DataFrame], version: str, store_path: str)-> str:
+    version_path = f'{store_path}/{version}'
+    os.makedirs(store_path, exist_ok=True)
+    if not os.path.isdir(version_path):
+        # Written aside and renamed, so a version directory is always complete.
+        tmp_path = f'{version_path}.tmp{os.getpid()}'
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+        for name, df in tables.items():
+            write_shared_table(df, f'{tmp_path}/{name}.arrow')
+        try:
+            os.replace(tmp_path, version_path)
+        except OSError:
+            # Another loader published the same version first.
+            shutil.rmtree(tmp_path, ignore_errors=True)
+
+    tmp_current = f'{store_path}/{CURRENT_FILE}.tmp{os.getpid()}'
+    with open(tmp_current, 'w') as file:
+        json.dump({'version': version, 'tables': sorted(tables)}, file)
+    os.replace(tmp_current, f'{store_path}/{CURRENT_FILE}')
+    _prune_versions(store_path, version)
+    return version_path
+
+if __name__ == '__main__':
+    import argparse
+    from olist.cache import CACHE_PATH, source_data_version
+    from olist.loader import load_datasets
+    from olist.cube import CUBE_NAME, create_revenue_cube
+    from olist.engine import create_engine
+    from olist.geo import ENRICHED_GEO_NAME, ZipCentroidIndex, create_enriched_geo_orders_dataframe
+    from olist.flows import OD_MATRIX_NAME, create_flow_items_dataframe, create_od_matrix
+    from olist.memory import memory_report
+
+    parser = argparse.ArgumentParser(description='Publica as tabelas limpas no store compartilhado')
+    parser.add_argument('--store', default=SHARED_STORE_PATH or f'{CACHE_PATH}/shared')
+    args = parser.parse_args()
+
+    df_obj = load_datasets()
+    tables = df_obj.loaded_tables()
+    tables[CUBE_NAME] = create_revenue_cube(df_obj)
+    zip_index = ZipCentroidIndex.from_geolocation(df_obj.df_geolocation)
+    engine = create_engine()
+    tables[ENRICHED_GEO_NAME] = create_enriched_geo_orders_dataframe(df_obj, zip_index, engine)
+    tables[OD_MATRIX_NAME] = create_od_matrix(create_flow_items_dataframe(df_obj, zip_index, engine), engine)
+    version_path = publish_shared_store(tables, source_data_version(), args.store)
+    print(memory_report(tables).to_string(index=False))
+    print(f'publicado em {version_path}')
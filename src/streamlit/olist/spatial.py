@@ -0,0 +1,127 @@
+import numpy as np
+import pandas as pd
+from olist.profiling import profiled
+
+SQRT_3 = np.sqrt(3)
+EARTH_RADIUS_KM = 6371.0088
+
+def haversine_km(lat1, lng1, lat2, lng2)-> np.ndarray:
+    # Great-circle distance, element-wise; NaN coordinates give NaN.
+    lat1, lng1, lat2, lng2 = (np.radians(np.asarray(values, dtype='float64')) for values in (lat1, lng1, lat2, lng2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+def _grid_cells(lat: np.ndarray, lng: np.ndarray, cell_size: float)-> tuple[np.ndarray, np.ndarray]:
+    column = np.floor(lng / cell_size).astype('int64')
+    row = np.floor(lat / cell_size).astype('int64')
+    return column, row
+
+def _grid_centers(column: np.ndarray, row: np.ndarray, cell_size: float)-> tuple[np.ndarray, np.ndarray]:
+    return (row + 0.5) * cell_size, (column + 0.5) * cell_size
+
+def _hex_cells(lat: np.ndarray, lng: np.ndarray, cell_size: float)-> tuple[np.ndarray, np.ndarray]:
+    # Pointy-top axial coordinates with cube rounding, longitude as x.
+    q = (SQRT_3 / 3 * lng - lat / 3) / cell_size
+    r = (2 / 3 * lat) / cell_size
+    s = -q - r
+    rounded_q, rounded_r, rounded_s = np.round(q), np.round(r), np.round(s)
+    diff_q, diff_r, diff_s = np.abs(rounded_q - q), np.abs(rounded_r - r), np.abs(rounded_s - s)
+    fix_q = (diff_q > diff_r) & (diff_q > diff_s)
+    fix_r = ~fix_q & (diff_r > diff_s)
+    rounded_q = np.where(fix_q, -rounded_r - rounded_s, rounded_q)
+    rounded_r = np.where(fix_r, -rounded_q - rounded_s, rounded_r)
+    return rounded_q.astype('int64'), rounded_r.astype('int64')
+
+def _hex_centers(q: np.ndarray, r: np.ndarray, cell_size: float)-> tuple[np.ndarray, np.ndarray]:
+    return cell_size * 1.5 * r, cell_size * SQRT_3 * (q + r / 2)
+
+def unique_cells(cell_x: np.ndarray, cell_y: np.ndarray)-> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # Packs both cell coordinates in one int64 so np.unique runs on a flat array.
+    offset = np.int64(2 ** 31)
+    keys = ((cell_x + offset) << 32) | (cell_y + offset)
+    unique_keys, inverse = np.unique(keys, return_inverse=True)
+    return (unique_keys >> 32) - offset, (unique_keys & 0xFFFFFFFF) - offset, inverse.reshape(-1)
+
+def aggregate_groups(
+        df: pd.DataFrame,
+        inverse: np.ndarray,
+        n_groups: int,
+        category_column: str = 'product_macro_category_rename',
+        lat_column: str = 'geolocation_lat',
+        lng_column: str = 'geolocation_lng'
+    )-> pd.DataFrame:
+    # Streamed geo aggregates carry how many items each row stands for.
+    weights = df['item_count'].to_numpy(dtype='float64') if 'item_count' in df else None
+    count = np.bincount(inverse, weights=weights, minlength=n_groups).astype('int64')
+    price = np.bincount(inverse, weights=df['price'].to_numpy(dtype='float64'), minlength=n_groups)
+    freight = np.bincount(inverse, weights=df['freight_value'].to_numpy(dtype='float64'), minlength=n_groups)
+    lat = df[lat_column].to_numpy(dtype='float64')
+    lng = df[lng_column].to_numpy(dtype='float64')
+    if weights is not None:
+        # The centroid is the item-weighted mean, like the count it divides by.
+        lat = lat * weights
+        lng = lng * weights
+    lat = np.bincount(inverse, weights=lat, minlength=n_groups) / np.maximum(count, 1)
+    lng = np.bincount(inverse, weights=lng, minlength=n_groups) / np.maximum(count, 1)
+
+    # Dominant category: count (group, category) pairs and keep the largest per group.
+    category = df[category_column].astype('category')
+    category_codes = category.cat.codes.to_numpy().astype('int64') + 1
+    n_categories = len(category.cat.categories) + 1
+    pair_counts = np.bincount(inverse * n_categories + category_codes, weights=weights, minlength=n_groups * n_categories)
+    dominant_codes = pair_counts.reshape(n_groups, n_categories).argmax(axis=1) - 1
+
+    return pd.DataFrame({
+        lat_column: lat,
+        lng_column: lng,
+        'count': count,
+        'price': price,
+        'freight_value': freight,
+        category_column: pd.Categorical.from_codes(dominant_codes, category.cat.categories),
+    })
+
+@profiled
+def bin_points(
+        df: pd.DataFrame,
+        cell_size: float = 0.5,
+        kind: str = 'grid',
+        lat_column: str = 'geolocation_lat',
+        lng_column: str = 'geolocation_lng',
+        category_column: str = 'product_macro_category_rename'
+    )-> pd.DataFrame:
+    if kind not in ('grid', 'hex'):
+        raise ValueError(f'Tipo de agregação desconhecido: {kind}')
+    columns = ['cell_lat', 'cell_lng', 'count', 'price', 'freight_value', category_column]
+    df = df[df[lat_column].notna() & df[lng_column].notna()]
+    if df.empty:
+        return pd.DataFrame(columns=columns)
+
+    lat = df[lat_column].to_numpy(dtype='float64')
+    lng = df[lng_column].to_numpy(dtype='float64')
+    if kind == 'grid':
+        cell_x, cell_y = _grid_cells(lat, lng, cell_size)
+    else:
+        cell_x, cell_y = _hex_cells(lat, lng, cell_size)
+
+    unique_x, unique_y, inverse = unique_cells(cell_x, cell_y)
+    df_cells = aggregate_groups(df, inverse, len(unique_x), category_column, lat_column, lng_column)
+
+    if kind == 'grid':
+        cell_lat, cell_lng = _grid_centers(unique_x, unique_y, cell_size)
+    else:
+        cell_lat, cell_lng = _hex_centers(unique_x, unique_y, cell_size)
+    df_cells.insert(0, 'cell_lat', cell_lat)
+    df_cells.insert(1, 'cell_lng', cell_lng)
+    return df_cells[columns].sort_values('count', ascending=False, ignore_index=True)
+
+def cell_polygon(cell_lat: float, cell_lng: float, cell_size: float, kind: str = 'grid')-> list[list[float]]:
+    if kind == 'grid':
+        half = cell_size / 2
+        return [
+            [cell_lat - half, cell_lng - half],
+            [cell_lat - half, cell_lng + half],
+            [cell_lat + half, cell_lng + half],
+            [cell_lat + half, cell_lng - half],
+        ]
+    angles = np.deg2rad(60 * np.arange(6) - 30)
+    return [[cell_lat + cell_size * np.sin(a), cell_lng + cell_size * np.cos(a)] for a in angles]
@@ -0,0 +1,343 @@
+from dataclasses import dataclass, field
+from typing import Iterator
+import numpy as np
+import pandas as pd
+from olist.tables import DATA_PATH, TABLE_SPECS
+from olist.config import STREAMING_CHUNK_SIZE
+from olist.taxonomy import macro_category_of, region_of
+from olist.profiling import profiled
+from olist.spatial import haversine_km
+
+# Streaming mode never holds a whole source table. Ids are reduced to 64-bit
+# hashes and strings to small integer codes; only the lookups needed to join
+# order items (orders and products) and the aggregates stay resident.
+
+def read_csv_chunks(
+        name: str,
+        columns: list[str],
+        data_path: str = DATA_PATH,
+        chunksize: int = STREAMING_CHUNK_SIZE
+    )-> Iterator[pd.DataFrame]:
+    spec = TABLE_SPECS[name]
+    yield from pd.read_csv(
+        f'{data_path}/{spec.file_name}',
+        usecols=columns,
+        dtype={column: dtype for column, dtype in spec.dtype.items() if column in columns},
+        parse_dates=[column for column in spec.parse_dates if column in columns],
+        chunksize=chunksize,
+    )
+
+def hash_ids(ids: pd.Series)-> np.ndarray:
+    return pd.util.hash_array(ids.to_numpy(dtype=object))
+
+@dataclass
+class CodeBook:
+    values: list = field(default_factory=list)
+
+    def encode(self, series: pd.Series)-> np.ndarray:
+        # Codes stay stable across chunks; unseen values are appended.
+        codes, uniques = pd.factorize(series)
+        if len(uniques) == 0:
+            return np.full(len(codes), -1, dtype='int32')
+        mapping = pd.Index(self.values, dtype=object).get_indexer(uniques)
+        for position in np.flatnonzero(mapping < 0):
+            mapping[position] = len(self.values)
+            self.values.append(uniques[position])
+        return np.where(codes >= 0, mapping.take(codes, mode='clip'), -1).astype('int32')
+
+    def decode(self, codes: np.ndarray)-> pd.Categorical:
+        return pd.Categorical.from_codes(codes, categories=self.values)
+
+@dataclass(frozen=True)
+class HashLookup:
+    hashes: np.ndarray
+    columns: dict[str, np.ndarray]
+
+    @classmethod
+    def from_parts(cls, parts: list[tuple[np.ndarray, dict[str, np.ndarray]]])-> 'HashLookup':
+        if not parts:
+            return cls(hashes=np.array([], dtype='uint64'), columns={})
+        hashes = np.concatenate([part_hashes for part_hashes, _ in parts])
+        order = np.argsort(hashes, kind='stable')
+        columns = {name: np.concatenate([part[name] for _, part in parts])[order] for name in parts[0][1]}
+        return cls(hashes=hashes[order], columns=columns)
+
+    def positions(self, hashes: np.ndarray)-> tuple[np.ndarray, np.ndarray]:
+        if len(self.hashes) == 0:
+            return np.zeros(len(hashes), dtype='intp'), np.zeros(len(hashes), dtype=bool)
+        positions = np.minimum(np.searchsorted(self.hashes, hashes), len(self.hashes) - 1)
+        return positions, self.hashes[positions] == hashes
+
+    def get(self, column: str, hashes: np.ndarray, fill)-> np.ndarray:
+        positions, found = self.positions(hashes)
+        values = self.columns[column]
+        if len(values) == 0:
+            return np.full(len(hashes), fill, dtype=values.dtype)
+        return np.where(found, values[positions], fill).astype(values.dtype)
+
+@dataclass
+class GroupTotals:
+    keys: list[str]
+    agg_dict: dict[str, str]
+    totals: pd.DataFrame | None = None
+
+    def update(self, df: pd.DataFrame):
+        # Keys are integer codes, so aligning the running totals is cheap.
+        chunk_totals = df.groupby(self.keys, sort=False).agg(self.agg_dict)
+        self.totals = chunk_totals if self.totals is None else self.totals.add(chunk_totals, fill_value=0)
+
+    def result(self)-> pd.DataFrame:
+        if self.totals is None:
+            return pd.DataFrame(columns=[*self.keys, *self.agg_dict])
+        return self.totals.sort_index().reset_index()
+
+def stream_zip_centroid_sums(data_path: str = DATA_PATH, chunksize: int = STREAMING_CHUNK_SIZE)-> pd.DataFrame:
+    columns = ['geolocation_zip_code_prefix', 'geolocation_lat', 'geolocation_lng']
+    totals = GroupTotals(
+        keys=['geolocation_zip_code_prefix'],
+        agg_dict={'point_count': 'sum', 'lat': 'sum', 'lng': 'sum', 'lat_sq': 'sum', 'lng_sq': 'sum'},
+    )
+    for df_chunk in read_csv_chunks('df_geolocation', columns, data_path, chunksize):
+        totals.update(pd.DataFrame({
+            'geolocation_zip_code_prefix': df_chunk['geolocation_zip_code_prefix'],
+            'point_count': 1,
+            'lat': df_chunk['geolocation_lat'],
+            'lng': df_chunk['geolocation_lng'],
+            'lat_sq': df_chunk['geolocation_lat'] ** 2,
+            'lng_sq': df_chunk['geolocation_lng'] ** 2,
+        }))
+    return totals.result()
+
+@dataclass
+class OrderLookups:
+    orders: HashLookup
+    products: HashLookup
+    states: CodeBook
+    macro_categories: CodeBook
+
+def build_order_lookups(data_path: str = DATA_PATH, chunksize: int = STREAMING_CHUNK_SIZE)-> OrderLookups:
+    states = CodeBook()
+    macro_categories = CodeBook()
+
+    customer_parts = []
+    customer_columns = ['customer_id', 'customer_zip_code_prefix', 'customer_state']
+    for df_chunk in read_csv_chunks('df_customers', customer_columns, data_path, chunksize):
+        customer_parts.append((hash_ids(df_chunk['customer_id']), {
+            'zip': df_chunk['customer_zip_code_prefix'].to_numpy(dtype='int32'),
+            'state': states.encode(df_chunk['customer_state']),
+        }))
+    customers = HashLookup.from_parts(customer_parts)
+    del customer_parts
+
+    # Orders keep the customer's zip and state, so customers can be dropped.
+    order_parts = []
+    order_columns = ['order_id', 'customer_id', 'order_purchase_timestamp']
+    for df_chunk in read_csv_chunks('df_orders', order_columns, data_path, chunksize):
+        customer_hashes = hash_ids(df_chunk['customer_id'])
+        order_parts.append((hash_ids(df_chunk['order_id']), {
+            'year': df_chunk['order_purchase_timestamp'].dt.year.to_numpy(dtype='int16'),
+            'zip': customers.get('zip', customer_hashes, -1),
+            'state': customers.get('state', customer_hashes, -1),
+        }))
+    orders = HashLookup.from_parts(order_parts)
+    del order_parts, customers
+
+    product_parts = []
+    for df_chunk in read_csv_chunks('df_products', ['product_id', 'product_category_name'], data_path, chunksize):
+        product_category_name = df_chunk['product_category_name'].fillna('outros')
+        product_parts.append((hash_ids(df_chunk['product_id']), {
+            'macro_category': macro_categories.encode(product_category_name.str.split('_').str[0]),
+        }))
+    products = HashLookup.from_parts(product_parts)
+    return OrderLookups(orders=orders, products=products, states=states, macro_categories=macro_categories)
+
+def stream_order_items(
+        lookups: OrderLookups,
+        data_path: str = DATA_PATH,
+        chunksize: int = STREAMING_CHUNK_SIZE
+    )-> Iterator[pd.DataFrame]:
+    # The items of one order are contiguous in the Olist export. The last order
+    # of each chunk is held back for the next one so per-chunk distinct order
+    # counts add up exactly; an unsorted export only over-counts split orders.
+    columns = ['order_id', 'product_id', 'seller_id', 'price', 'freight_value', 'shipping_limit_date']
+    df_carry = None
+    for df_chunk in read_csv_chunks('df_order_items', columns, data_path, chunksize):
+        if df_carry is not None:
+            df_chunk = pd.concat([df_carry, df_chunk], ignore_index=True)
+        is_last_order = (df_chunk['order_id'] == df_chunk['order_id'].iat[-1]).to_numpy()
+        df_carry = df_chunk[is_last_order]
+        if not is_last_order.all():
+            yield _enrich_items(df_chunk[~is_last_order], lookups)
+    if df_carry is not None and len(df_carry):
+        yield _enrich_items(df_carry, lookups)
+
+def _enrich_items(df_items: pd.DataFrame, lookups: OrderLookups)-> pd.DataFrame:
+    order_hashes = hash_ids(df_items['order_id'])
+    product_hashes = hash_ids(df_items['product_id'])
+    return pd.DataFrame({
+        'order_hash': order_hashes,
+        'seller_hash': hash_ids(df_items['seller_id']),
+        'macro_category': lookups.products.get('macro_category', product_hashes, -1),
+        'item_year': df_items['shipping_limit_date'].dt.year.to_numpy(dtype='int16'),
+        'month': df_items['shipping_limit_date'].dt.month.to_numpy(dtype='int8'),
+        'order_year': lookups.orders.get('year', order_hashes, -1),
+        'zip': lookups.orders.get('zip', order_hashes, -1),
+        'state': lookups.orders.get('state', order_hashes, -1),
+        'price': df_items['price'].to_numpy(dtype='float64'),
+        'freight_value': df_items['freight_value'].to_numpy(dtype='float64'),
+        'item_count': 1,
+    })
+
+def build_seller_lookup(states: CodeBook, data_path: str = DATA_PATH, chunksize: int = STREAMING_CHUNK_SIZE)-> HashLookup:
+    seller_parts = []
+    for df_chunk in read_csv_chunks('df_sellers', ['seller_id', 'seller_zip_code_prefix', 'seller_state'], data_path, chunksize):
+        seller_parts.append((hash_ids(df_chunk['seller_id']), {
+            'zip': df_chunk['seller_zip_code_prefix'].to_numpy(dtype='int32'),
+            'state': states.encode(df_chunk['seller_state']),
+        }))
+    return HashLookup.from_parts(seller_parts)
+
+@dataclass(frozen=True)
+class StreamedAggregates:
+    cube: pd.DataFrame
+    geo: pd.DataFrame
+    od: pd.DataFrame
+    lookups: OrderLookups
+    seller_states: CodeBook
+
+@profiled
+def stream_aggregates(zip_index, data_path: str = DATA_PATH, chunksize: int = STREAMING_CHUNK_SIZE)-> StreamedAggregates:
+    # One pass over the items feeds the revenue cube, the geo totals and the
+    # OD matrix; the lookups are built once for all three. Seller states get
+    # their own code book so the customer state categories stay as they were.
+    lookups = build_order_lookups(data_path, chunksize)
+    seller_states = CodeBook()
+    sellers = build_seller_lookup(seller_states, data_path, chunksize)
+    cube_totals = GroupTotals(
+        keys=['macro_category', 'item_year', 'month', 'state'],
+        agg_dict={'price': 'sum', 'freight_value': 'sum', 'order_hash': 'nunique', 'item_count': 'sum'},
+    )
+    geo_totals = GroupTotals(
+        keys=['order_year', 'zip', 'state', 'macro_category'],
+        agg_dict={'price': 'sum', 'freight_value': 'sum', 'item_count': 'sum'},
+    )
+    od_totals = GroupTotals(
+        keys=['seller_state', 'state', 'order_year', 'macro_category'],
+        agg_dict={'item_count': 'sum', 'price': 'sum', 'freight_value': 'sum', 'distance_km': 'sum'},
+    )
+    for df_items in stream_order_items(lookups, data_path, chunksize):
+        has_product = df_items['macro_category'].to_numpy() >= 0
+        mask_2017_2018 = df_items['item_year'].between(2017, 2018).to_numpy()
+        cube_totals.update(df_items[has_product & mask_2017_2018])
+        has_customer = (df_items['zip'].to_numpy() >= 0) & (df_items['state'].to_numpy() >= 0)
+        geo_totals.update(df_items[has_product & has_customer])
+
+        seller_hashes = df_items['seller_hash'].to_numpy()
+        seller_lat, seller_lng = zip_index.lookup_nearest(sellers.get('zip', seller_hashes, -1))
+        customer_lat, customer_lng = zip_index.lookup_nearest(df_items['zip'].to_numpy())
+        df_items = df_items.assign(
+            seller_state=sellers.get('state', seller_hashes, -1),
+            distance_km=haversine_km(seller_lat, seller_lng, customer_lat, customer_lng),
+        )
+        has_route = (
+            (df_items['seller_state'].to_numpy() >= 0)
+            & (df_items['state'].to_numpy() >= 0)
+            & (df_items['order_year'].to_numpy() >= 0)
+            & df_items['distance_km'].notna().to_numpy()
+        )
+        od_totals.update(df_items[has_route])
+    return StreamedAggregates(
+        cube=cube_totals.result(),
+        geo=geo_totals.result(),
+        od=od_totals.result(),
+        lookups=lookups,
+        seller_states=seller_states,
+    )
+
+@profiled
+def stream_revenue_cube(aggregates: StreamedAggregates)-> pd.DataFrame:
+    df_totals, lookups = aggregates.cube, aggregates.lookups
+    df_cube = pd.DataFrame({
+        'product_macro_category': lookups.macro_categories.decode(df_totals['macro_category'].to_numpy()),
+        'year': df_totals['item_year'].astype('int16'),
+        'month': df_totals['month'].astype('int8'),
+        'customer_state': lookups.states.decode(df_totals['state'].to_numpy()),
+    })
+    df_cube.insert(1, 'product_macro_category_rename', macro_category_of(df_cube['product_macro_category']))
+    df_cube['region'] = region_of(df_cube['customer_state'])
+    df_cube['price'] = df_totals['price']
+    df_cube['freight_value'] = df_totals['freight_value']
+    df_cube['order_count'] = df_totals['order_hash'].astype('int32')
+    df_cube['item_count'] = df_totals['item_count'].astype('int32')
+    return df_cube
+
+@profiled
+def stream_geo_aggregates(aggregates: StreamedAggregates, zip_index)-> pd.DataFrame:
+    # One row per (year, zip prefix, category) placed at the zip centroid;
+    # item_count weights the row wherever the page counts orders.
+    df_totals, lookups = aggregates.geo, aggregates.lookups
+    lat, lng = zip_index.lookup(df_totals['zip'].to_numpy())
+    df_geo = pd.DataFrame({
+        'year': df_totals['order_year'].astype('int16'),
+        'customer_zip_code_prefix': df_totals['zip'].astype('int32'),
+        'customer_state': lookups.states.decode(df_totals['state'].to_numpy()),
+        'product_macro_category': lookups.macro_categories.decode(df_totals['macro_category'].to_numpy()),
+        'price': df_totals['price'],
+        'freight_value': df_totals['freight_value'],
+        'item_count': df_totals['item_count'].astype('int32'),
+        'geolocation_lat': lat.astype('float32'),
+        'geolocation_lng': lng.astype('float32'),
+    })
+    df_geo['region'] = region_of(df_geo['customer_state'])
+    df_geo['product_macro_category_rename'] = macro_category_of(df_geo['product_macro_category'])
+    return df_geo.dropna(subset=['geolocation_lat', 'geolocation_lng']).reset_index(drop=True)
+
+@profiled
+def stream_od_matrix(aggregates: StreamedAggregates)-> pd.DataFrame:
+    # Same rows as flows.create_od_matrix: distances between the seller's and
+    # the customer's zip centroids, summed per corridor.
+    df_totals, lookups = aggregates.od, aggregates.lookups
+    df_od = pd.DataFrame({
+        'seller_state': aggregates.seller_states.decode(df_totals['seller_state'].to_numpy()),
+        'customer_state': lookups.states.decode(df_totals['state'].to_numpy()),
+        'year': df_totals['order_year'].astype('int16'),
+        'product_macro_category_rename': macro_category_of(
+            pd.Series(lookups.macro_categories.decode(df_totals['macro_category'].to_numpy()))
+        ),
+    })
+    df_od['item_count'] = df_totals['item_count'].astype('int32')
+    df_od['price'] = df_totals['price']
+    df_od['freight_value'] = df_totals['freight_value']
+    df_od['distance_km'] = df_totals['distance_km']
+    # Several raw categories share a macro category, so the rows are merged once more.
+    dimensions = ['seller_state', 'customer_state', 'year', 'product_macro_category_rename']
+    df_od = df_od.groupby(dimensions, observed=True).sum().reset_index()
+    return df_od.astype({'item_count': 'int32'})
+
+if __name__ == '__main__':
+    # Parity check of the streamed geo aggregates against the in-memory frame:
+    # weighted rows must give the same map cells and cell centroids.
+    from olist.loader import OlistCatalog
+    from olist.engine import assert_same_result
+    from olist.geo import ZipCentroidIndex, create_enriched_geo_orders_dataframe
+    from olist.spatial import _grid_cells, _hex_cells, aggregate_groups, unique_cells
+
+    df_obj = OlistCatalog()
+    zip_index = ZipCentroidIndex.from_geolocation(df_obj.df_geolocation)
+    streamed_zip_index = ZipCentroidIndex.from_sums(stream_zip_centroid_sums())
+    frames = {
+        'memoria': create_enriched_geo_orders_dataframe(df_obj, zip_index),
+        'streaming': stream_geo_aggregates(stream_aggregates(streamed_zip_index), streamed_zip_index),
+    }
+    for kind, cells_of in {'grid': _grid_cells, 'hex': _hex_cells}.items():
+        for cell_size in (0.5, 2.0):
+            results = []
+            for df in frames.values():
+                cell_x, cell_y = cells_of(df['geolocation_lat'].to_numpy('float64'), df['geolocation_lng'].to_numpy('float64'), cell_size)
+                unique_x, unique_y, inverse = unique_cells(cell_x, cell_y)
+                df_cells = aggregate_groups(df, inverse, len(unique_x))
+                df_cells.insert(0, 'cell_x', unique_x)
+                df_cells.insert(1, 'cell_y', unique_y)
+                results.append(df_cells.drop(columns='product_macro_category_rename').sort_values(['cell_x', 'cell_y'], ignore_index=True))
+            assert_same_result(*results, rtol=1e-6)
+            print(f'{kind} {cell_size}: ok ({len(results[0])} células)')
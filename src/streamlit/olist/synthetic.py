@@ -0,0 +1,216 @@
+import argparse
+import os
+import shutil
+import numpy as np
+import pandas as pd
+from olist.tables import DATA_PATH, TABLE_SPECS
+
+# Generates an Olist-shaped dataset for load tests. Products, sellers and the
+# category translation come from the bundled files; zip prefixes, cities and
+# states are drawn from the sellers file, so customers follow its distribution.
+OLIST_ORDERS = 99_441
+GENERATOR_CHUNK_ORDERS = 250_000
+GEOLOCATION_POINTS_PER_ZIP = 50
+# Kept apart from the source files, which the generated tables would overwrite.
+SYNTHETIC_DATA_PATH = f'{DATA_PATH}/synthetic'
+ZIP_UNIVERSE_SIZE = 19_000
+
+# Approximate centre of each state, used to place the zip centroids.
+STATE_CENTERS: dict[str, tuple[float, float]] = {
+    'AC': (-9.0, -70.5), 'AL': (-9.6, -36.6), 'AM': (-4.0, -63.0), 'AP': (1.4, -51.8),
+    'BA': (-12.5, -41.7), 'CE': (-5.2, -39.5), 'DF': (-15.8, -47.9), 'ES': (-19.6, -40.7),
+    'GO': (-16.0, -49.6), 'MA': (-5.0, -45.3), 'MG': (-18.5, -44.5), 'MS': (-20.5, -54.6),
+    'MT': (-13.0, -56.0), 'PA': (-4.0, -52.5), 'PB': (-7.1, -36.8), 'PE': (-8.4, -37.9),
+    'PI': (-7.7, -42.7), 'PR': (-24.6, -51.5), 'RJ': (-22.3, -42.7), 'RN': (-5.8, -36.6),
+    'RO': (-10.9, -62.8), 'RR': (2.1, -61.4), 'RS': (-29.8, -53.3), 'SC': (-27.3, -50.4),
+    'SE': (-10.6, -37.4), 'SP': (-22.3, -48.7), 'TO': (-10.2, -48.3),
+}
+STATE_SPREAD = 1.0
+
+ORDER_STATUSES = {'delivered': 0.970, 'shipped': 0.011, 'canceled': 0.006, 'unavailable': 0.006, 'invoiced': 0.004, 'processing': 0.003}
+PAYMENT_TYPES = {'credit_card': 0.739, 'boleto': 0.190, 'voucher': 0.056, 'debit_card': 0.015}
+ITEMS_PER_ORDER = {1: 0.901, 2: 0.076, 3: 0.012, 4: 0.006, 5: 0.003, 6: 0.002}
+FIRST_PURCHASE = pd.Timestamp('2016-09-04')
+LAST_PURCHASE = pd.Timestamp('2018-10-17')
+
+def _choice(rng: np.random.Generator, distribution: dict, size: int)-> np.ndarray:
+    weights = np.array(list(distribution.values()), dtype='float64')
+    return np.array(list(distribution))[rng.choice(len(weights), size, p=weights / weights.sum())]
+
+def hex_ids(rng: np.random.Generator, size: int)-> np.ndarray:
+    # 32 hex characters like the Olist ids, from 128 random bits.
+    high, low = rng.integers(0, 2 ** 63, size, dtype='int64'), rng.integers(0, 2 ** 63, size, dtype='int64')
+    return np.array([f'{a:016x}{b:016x}' for a, b in zip(high.tolist(), low.tolist())], dtype=object)
+
+def create_zip_universe(df_sellers: pd.DataFrame, rng: np.random.Generator, size: int = ZIP_UNIVERSE_SIZE)-> pd.DataFrame:
+    # Seller zips are the seeds, weighted by how many sellers they hold; more
+    # prefixes are derived next to them and inherit their city and state.
+    df_seeds = df_sellers.groupby(['seller_zip_code_prefix', 'seller_city', 'seller_state'], observed=True).size().reset_index(name='weight')
+    df_seeds = df_seeds.drop_duplicates('seller_zip_code_prefix').reset_index(drop=True)
+    df_seeds.columns = ['zip_code_prefix', 'city', 'state', 'weight']
+    centers = np.array([STATE_CENTERS.get(state, STATE_CENTERS['DF']) for state in df_seeds['state']])
+    df_seeds['lat'] = centers[:, 0] + rng.normal(0, STATE_SPREAD, len(df_seeds))
+    df_seeds['lng'] = centers[:, 1] + rng.normal(0, STATE_SPREAD, len(df_seeds))
+
+    extra = max(size - len(df_seeds), 0)
+    parents = rng.choice(len(df_seeds), extra * 2, p=df_seeds['weight'] / df_seeds['weight'].sum())
+    df_derived = df_seeds.iloc[parents].reset_index(drop=True)
+    df_derived['zip_code_prefix'] = np.clip(df_derived['zip_code_prefix'] + rng.integers(-200, 201, len(df_derived)), 1000, 99999)
+    df_derived['lat'] += rng.normal(0, 0.1, len(df_derived))
+    df_derived['lng'] += rng.normal(0, 0.1, len(df_derived))
+    df_zips = pd.concat([df_seeds, df_derived], ignore_index=True).drop_duplicates('zip_code_prefix')
+    return df_zips.head(max(size, len(df_seeds))).reset_index(drop=True)
+
+def create_geolocation(df_zips: pd.DataFrame, rng: np.random.Generator, points_per_zip: int = GEOLOCATION_POINTS_PER_ZIP)-> pd.DataFrame:
+    counts = rng.poisson(points_per_zip, len(df_zips)) + 1
+    positions = np.repeat(np.arange(len(df_zips)), counts)
+    df_points = df_zips.iloc[positions]
+    return pd.DataFrame({
+        'geolocation_zip_code_prefix': df_points['zip_code_prefix'].to_numpy(),
+        'geolocation_lat': (df_points['lat'].to_numpy() + rng.normal(0, 0.01, len(positions))).round(6),
+        'geolocation_lng': (df_points['lng'].to_numpy() + rng.normal(0, 0.01, len(positions))).round(6),
+        'geolocation_city': df_points['city'].to_numpy(),
+        'geolocation_state': df_points['state'].to_numpy(),
+    })
+
+def _purchase_timestamps(rng: np.random.Generator, size: int)-> pd.DatetimeIndex:
+    # Order volume grows over the period, like the marketplace did.
+    span = (LAST_PURCHASE - FIRST_PURCHASE).total_seconds()
+    offsets = np.sqrt(rng.uniform(0, 1, size)) * span
+    return FIRST_PURCHASE + pd.to_timedelta(offsets.astype('int64'), unit='s')
+
+def create_orders_chunk(
+        size: int,
+        df_zips: pd.DataFrame,
+        df_products: pd.DataFrame,
+        df_sellers: pd.DataFrame,
+        category_prices: pd.Series,
+        rng: np.random.Generator
+    )-> dict[str, pd.DataFrame]:
+    zip_weights = df_zips['weight'] / df_zips['weight'].sum()
+    df_customer_zips = df_zips.iloc[rng.choice(len(df_zips), size, p=zip_weights)]
+    customer_ids = hex_ids(rng, size)
+    df_customers = pd.DataFrame({
+        'customer_id': customer_ids,
+        'customer_unique_id': hex_ids(rng, size),
+        'customer_zip_code_prefix': df_customer_zips['zip_code_prefix'].to_numpy(),
+        'customer_city': df_customer_zips['city'].to_numpy(),
+        'customer_state': df_customer_zips['state'].to_numpy(),
+    })
+
+    order_ids = hex_ids(rng, size)
+    purchase = _purchase_timestamps(rng, size)
+    approved = purchase + pd.to_timedelta(rng.exponential(10, size), unit='h')
+    carrier = approved + pd.to_timedelta(rng.gamma(2, 1.5, size), unit='D')
+    delivered = carrier + pd.to_timedelta(rng.gamma(3, 3, size), unit='D')
+    status = _choice(rng, ORDER_STATUSES, size)
+    is_delivered = status == 'delivered'
+    df_orders = pd.DataFrame({
+        'order_id': order_ids,
+        'customer_id': customer_ids,
+        'order_status': status,
+        'order_purchase_timestamp': purchase,
+        'order_approved_at': approved,
+        'order_delivered_carrier_date': carrier.where(is_delivered | (status == 'shipped')),
+        'order_delivered_customer_date': delivered.where(is_delivered),
+        'order_estimated_delivery_date': (purchase + pd.to_timedelta(rng.integers(15, 40, size), unit='D')).normalize(),
+    })
+
+    # Items of one order are written on consecutive rows, as in the export.
+    items_per_order = _choice(rng, ITEMS_PER_ORDER, size).astype('int64')
+    order_positions = np.repeat(np.arange(size), items_per_order)
+    n_items = len(order_positions)
+    order_item_id = np.arange(n_items) - np.repeat(np.cumsum(items_per_order) - items_per_order, items_per_order) + 1
+    product_positions = rng.choice(len(df_products), n_items)
+    categories = df_products['product_category_name'].fillna('outros').to_numpy()[product_positions]
+    median_price = category_prices.reindex(categories).fillna(category_prices.median()).to_numpy()
+    price = (median_price * rng.lognormal(0, 0.6, n_items)).round(2)
+    weight = df_products['product_weight_g'].fillna(700).to_numpy()[product_positions]
+    freight_value = (8 + np.sqrt(weight) * 0.25 * rng.lognormal(0, 0.3, n_items)).round(2)
+    df_order_items = pd.DataFrame({
+        'order_id': order_ids[order_positions],
+        'order_item_id': order_item_id,
+        'product_id': df_products['product_id'].to_numpy()[product_positions],
+        'seller_id': df_sellers['seller_id'].to_numpy()[rng.choice(len(df_sellers), n_items)],
+        'shipping_limit_date': (purchase[order_positions] + pd.to_timedelta(rng.integers(2, 8, n_items), unit='D')),
+        'price': price,
+        'freight_value': freight_value,
+    })
+
+    order_totals = np.bincount(order_positions, weights=price + freight_value, minlength=size)
+    payment_type = _choice(rng, PAYMENT_TYPES, size)
+    installments = np.where(payment_type == 'credit_card', rng.integers(1, 11, size), 1)
+    df_order_payments = pd.DataFrame({
+        'order_id': order_ids,
+        'payment_sequential': 1,
+        'payment_type': payment_type,
+        'payment_installments': installments,
+        'payment_value': order_totals.round(2),
+    })
+    return {
+        'df_customers': df_customers,
+        'df_orders': df_orders,
+        'df_order_items': df_order_items,
+        'df_order_payments': df_order_payments,
+    }
+
+def generate_dataset(
+        output_path: str = SYNTHETIC_DATA_PATH,
+        orders: int = OLIST_ORDERS,
+        source_path: str = DATA_PATH,
+        seed: int = 0,
+        points_per_zip: int = GEOLOCATION_POINTS_PER_ZIP,
+        chunk_orders: int = GENERATOR_CHUNK_ORDERS
+    )-> dict[str, int]:
+    if os.path.abspath(output_path) == os.path.abspath(source_path):
+        raise ValueError(f'A saída não pode ser a pasta de origem: {output_path}')
+    rng = np.random.default_rng(seed)
+    df_products = pd.read_csv(f'{source_path}/{TABLE_SPECS["df_products"].file_name}')
+    df_sellers = pd.read_csv(f'{source_path}/{TABLE_SPECS["df_sellers"].file_name}')
+    os.makedirs(output_path, exist_ok=True)
+    # The catalog tables are reused as they are.
+    for name in ['df_products', 'df_sellers', 'df_product_category_translation']:
+        file_name = TABLE_SPECS[name].file_name
+        shutil.copyfile(f'{source_path}/{file_name}', f'{output_path}/{file_name}')
+
+    rows = {'df_products': len(df_products), 'df_sellers': len(df_sellers)}
+    df_zips = create_zip_universe(df_sellers, rng)
+    df_geolocation = create_geolocation(df_zips, rng, points_per_zip)
+    df_geolocation.to_csv(f'{output_path}/{TABLE_SPECS["df_geolocation"].file_name}', index=False)
+    rows['df_geolocation'] = len(df_geolocation)
+    del df_geolocation
+
+    # A median price per category keeps the categories' revenue ranking stable.
+    categories = df_products['product_category_name'].fillna('outros').unique()
+    category_prices = pd.Series(rng.lognormal(4.3, 0.6, len(categories)).round(2), index=categories)
+
+    # Orders are generated and appended in chunks so memory stays bounded.
+    generated = 0
+    while generated < orders:
+        size = min(chunk_orders, orders - generated)
+        tables = create_orders_chunk(size, df_zips, df_products, df_sellers, category_prices, rng)
+        for name, df in tables.items():
+            df.to_csv(
+                f'{output_path}/{TABLE_SPECS[name].file_name}',
+                mode='w' if generated == 0 else 'a',
+                header=generated == 0,
+                index=False,
+                date_format='%Y-%m-%d %H:%M:%S',
+            )
+            rows[name] = rows.get(name, 0) + len(df)
+        generated += size
+    return rows
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Gera um dataset sintético no formato do Olist')
+    parser.add_argument('--output', default=SYNTHETIC_DATA_PATH)
+    parser.add_argument('--source', default=DATA_PATH, help='pasta com os CSVs de produtos, vendedores e tradução')
+    parser.add_argument('--scale', type=float, default=1.0, help='múltiplo do número de pedidos do Olist')
+    parser.add_argument('--orders', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--points-per-zip', type=int, default=GEOLOCATION_POINTS_PER_ZIP)
+    args = parser.parse_args()
+
+    orders = args.orders or int(OLIST_ORDERS * args.scale)
+    for name, count in generate_dataset(args.output, orders, args.source, args.seed, args.points_per_zip).items():
+        print(f'{name}: {count} linhas')
@@ -0,0 +1,163 @@
+from dataclasses import dataclass, field
+from typing import Callable
+import os
+import time
+import numpy as np
+import pandas as pd
+from unidecode import unidecode
+
+DATA_PATH = os.environ.get('OLIST_DATA_PATH', './src/streamlit/data')
+
+@dataclass(frozen=True)
+class TableSpec:
+    file_name: str
+    dtype: dict = field(default_factory=dict)
+    parse_dates: list = field(default_factory=list)
+
+TABLE_SPECS: dict[str, TableSpec] = {
+    'df_customers': TableSpec(
+        file_name='olist_customers_dataset.csv',
+        dtype={
+            'customer_zip_code_prefix': 'int32',
+            'customer_city': 'category',
+            'customer_state': 'category',
+        },
+    ),
+    'df_geolocation': TableSpec(
+        file_name='olist_geolocation_dataset.csv',
+        dtype={
+            'geolocation_zip_code_prefix': 'int32',
+            'geolocation_lat': 'float64',
+            'geolocation_lng': 'float64',
+            'geolocation_city': 'category',
+            'geolocation_state': 'category',
+        },
+    ),
+    'df_order_items': TableSpec(
+        file_name='olist_order_items_dataset.csv',
+        dtype={
+            'order_item_id': 'int16',
+            'price': 'float64',
+            'freight_value': 'float64',
+        },
+        parse_dates=['shipping_limit_date'],
+    ),
+    'df_order_payments': TableSpec(
+        file_name='olist_order_payments_dataset.csv',
+        dtype={
+            'payment_sequential': 'int16',
+            'payment_type': 'category',
+            'payment_installments': 'int16',
+            'payment_value': 'float64',
+        },
+    ),
+    'df_orders': TableSpec(
+        file_name='olist_orders_dataset.csv',
+        dtype={
+            'order_status': 'category',
+        },
+        parse_dates=[
+            'order_purchase_timestamp',
+            'order_approved_at',
+            'order_delivered_carrier_date',
+            'order_delivered_customer_date',
+            'order_estimated_delivery_date',
+        ],
+    ),
+    'df_products': TableSpec(
+        file_name='olist_products_dataset.csv',
+        dtype={
+            'product_category_name': 'object',
+            'product_name_lenght': 'float32',
+            'product_description_lenght': 'float32',
+            'product_photos_qty': 'float32',
+            'product_weight_g': 'float32',
+            'product_length_cm': 'float32',
+            'product_height_cm': 'float32',
+            'product_width_cm': 'float32',
+        },
+    ),
+    'df_sellers': TableSpec(
+        file_name='olist_sellers_dataset.csv',
+        dtype={
+            'seller_zip_code_prefix': 'int32',
+            'seller_city': 'category',
+            'seller_state': 'category',
+        },
+    ),
+    'df_product_category_translation': TableSpec(
+        file_name='product_category_name_translation.csv',
+        dtype={
+            'product_category_name': 'category',
+            'product_category_name_english': 'category',
+        },
+    ),
+}
+
+def normalize_text_column(series: pd.Series, upper: bool = False)-> pd.Series:
+    # Transliterates each distinct value once and maps the result back through
+    # the codes, so the cost follows the number of unique values, not rows.
+    codes, uniques = pd.factorize(series)
+    if len(uniques) == 0:
+        # All missing: nothing to take codes from.
+        return pd.Series(pd.Categorical.from_codes(codes, []), index=series.index, name=series.name)
+    normalized = [unidecode(str(value)) for value in uniques]
+    normalized = [value.upper() if upper else value.lower() for value in normalized]
+    # Different spellings may collapse into one value ('São Paulo'/'sao paulo').
+    normalized_codes, categories = pd.factorize(pd.Index(normalized, dtype='object'))
+    codes = np.where(codes >= 0, normalized_codes.take(codes, mode='clip'), -1)
+    return pd.Series(pd.Categorical.from_codes(codes, categories), index=series.index, name=series.name)
+
+def _clean_customers(df_customers: pd.DataFrame)-> pd.DataFrame:
+    df_customers['customer_city'] = normalize_text_column(df_customers['customer_city'])
+    return df_customers
+
+def _clean_geolocation(df_geolocation: pd.DataFrame)-> pd.DataFrame:
+    df_geolocation['geolocation_city'] = normalize_text_column(df_geolocation['geolocation_city'])
+    df_geolocation['geolocation_state'] = normalize_text_column(df_geolocation['geolocation_state'], upper=True)
+    return df_geolocation
+
+def _clean_order_items(df_order_items: pd.DataFrame)-> pd.DataFrame:
+    df_order_items['year'] = df_order_items['shipping_limit_date'].dt.year.astype('int16')
+    return df_order_items
+
+def _clean_orders(df_orders: pd.DataFrame)-> pd.DataFrame:
+    df_orders['year'] = df_orders['order_purchase_timestamp'].dt.year.astype('int16')
+    return df_orders
+
+def _clean_sellers(df_sellers: pd.DataFrame)-> pd.DataFrame:
+    df_sellers['seller_city'] = normalize_text_column(df_sellers['seller_city'])
+    return df_sellers
+
+def _clean_products(df_products: pd.DataFrame)-> pd.DataFrame:
+    product_category_name = df_products['product_category_name'].fillna('outros')
+    df_products['product_category_name'] = product_category_name.astype('category')
+    df_products['product_macro_category'] = product_category_name.str.split('_').str[0].astype('category')
+    return df_products
+
+TABLE_TRANSFORMS: dict[str, Callable[[pd.DataFrame], pd.DataFrame]] = {
+    'df_customers': _clean_customers,
+    'df_geolocation': _clean_geolocation,
+    'df_order_items': _clean_order_items,
+    'df_orders': _clean_orders,
+    'df_products': _clean_products,
+    'df_sellers': _clean_sellers,
+}
+
+def read_table(name: str, data_path: str = DATA_PATH, timings: dict[str, float] | None = None)-> pd.DataFrame:
+    spec = TABLE_SPECS[name]
+    start = time.perf_counter()
+    df: pd.DataFrame = pd.read_csv(
+        f'{data_path}/{spec.file_name}',
+        dtype=spec.dtype,
+        parse_dates=spec.parse_dates,
+    )
+    read_seconds = time.perf_counter() - start
+    # Derived columns (years, macro category) run once their table is parsed.
+    transform = TABLE_TRANSFORMS.get(name)
+    if transform is not None:
+        df = transform(df)
+    if timings is not None:
+        timings['read'] = read_seconds
+        timings['transform'] = time.perf_counter() - start - read_seconds
+    return df
@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+
+MACRO_CATEGORIES: dict[str, list[str]] = {
+    'alimentos': ['alimentos','bebidas'],
+    'casa': ['cama','casa','eletrodomesticos','moveis'],
+    'construcao': ['construcao','ferramentas','climatizacao','sinalizacao'],
+    'informatica': ['consoles','eletroportateis','informatica','pc','pcs','portateis','tablets','telefonia'],
+    'eletronicos': ['audio','automotivo','eletronicos'],
+    'moda': ['artigos','bebes','cool','fashion','la','relogios'],
+    'saude': ['beleza','fraldas','perfumaria','esporte'],
+    'hobbies': ['cds','dvds','cine','utilidades','livros','musica','papelaria','flores','instrumentos','brinquedos','pet'],
+}
+DEFAULT_MACRO_CATEGORY = 'outros'
+
+MACRO_CATEGORY_COLORS: dict[str, str] = {
+    'alimentos': '#c4392f',
+    'construcao': '#c4a22f',
+    'eletronicos': '#1a1918',
+    'casa': '#0b4002',
+    'informatica': '#7d040e',
+    'moda': '#02dbf7',
+    'saude': '#0233f7',
+    'hobbies': '#926bc2',
+    'outros': '#d909d5',
+}
+DEFAULT_COLOR = MACRO_CATEGORY_COLORS['outros']
+
+REGIONS: dict[str, list[str]] = {
+    'Nordeste': ['BA', 'CE', 'MA', 'PB', 'PE', 'PI', 'RN', 'SE', 'AL'],
+    'Sudeste': ['SP', 'RJ', 'MG', 'ES'],
+    'Norte': ['AM', 'PA', 'AP', 'RR', 'RO', 'AC', 'TO'],
+    'Centro-Oeste': ['MT', 'MS', 'GO', 'DF'],
+    'Sul': ['PR', 'SC', 'RS'],
+}
+DEFAULT_REGION = 'Brasil'
+
+CATEGORY_TO_MACRO: dict[str, str] = {
+    category: macro_category
+    for macro_category, categories in MACRO_CATEGORIES.items()
+    for category in categories
+}
+STATE_TO_REGION: dict[str, str] = {
+    state: region
+    for region, states in REGIONS.items()
+    for state in states
+}
+
+def map_categories(series: pd.Series, mapping: dict[str, str], default: str)-> pd.Series:
+    # Maps the categories rather than the rows; missing values take the default.
+    categorical = series.astype('category')
+    mapped = [mapping.get(category, default) for category in categorical.cat.categories]
+    result_categories = pd.Index(list(dict.fromkeys([*mapped, default])), dtype='object')
+    lookup = np.append(result_categories.get_indexer(mapped), result_categories.get_loc(default))
+    codes = lookup[categorical.cat.codes.to_numpy()]
+    return pd.Series(
+        pd.Categorical.from_codes(codes, result_categories),
+        index=series.index,
+        name=series.name
+    )
+
+def macro_category_of(product_macro_category: pd.Series)-> pd.Series:
+    return map_categories(product_macro_category, CATEGORY_TO_MACRO, DEFAULT_MACRO_CATEGORY)
+
+def color_of(macro_category: pd.Series)-> pd.Series:
+    return map_categories(macro_category, MACRO_CATEGORY_COLORS, DEFAULT_COLOR)
+
+def region_of(state: pd.Series)-> pd.Series:
+    return map_categories(state, STATE_TO_REGION, DEFAULT_REGION)
@@ -0,0 +1,135 @@
+from dataclasses import dataclass, field
+import numpy as np
+import pandas as pd
+from olist.spatial import aggregate_groups, unique_cells
+from olist.taxonomy import color_of
+from olist.profiling import cache_resource, profiled
+
+MIN_ZOOM = 4
+MAX_ZOOM = 16
+
+# Zoom ranges and what one feature stands for at that range. Cell levels bin
+# the points into squares of an eighth of a tile at the current zoom.
+LOD_LEVELS: list[tuple[int, int, str]] = [
+    (0, 4, 'region'),
+    (5, 6, 'customer_state'),
+    (7, 11, 'cell'),
+    (12, MAX_ZOOM, 'point'),
+]
+
+def level_for_zoom(zoom: int)-> str:
+    zoom = min(max(int(zoom), MIN_ZOOM), MAX_ZOOM)
+    for min_zoom, max_zoom, level in LOD_LEVELS:
+        if min_zoom <= zoom <= max_zoom:
+            return level
+    return LOD_LEVELS[-1][2]
+
+def tile_xy(lat: np.ndarray, lng: np.ndarray, zoom: int)-> tuple[np.ndarray, np.ndarray]:
+    n_tiles = 2 ** zoom
+    lat = np.clip(np.asarray(lat, dtype='float64'), -85.0511, 85.0511)
+    lat_rad = np.deg2rad(lat)
+    x = np.floor((np.asarray(lng, dtype='float64') + 180.0) / 360.0 * n_tiles)
+    y = np.floor((1.0 - np.arcsinh(np.tan(lat_rad)) / np.pi) / 2.0 * n_tiles)
+    return np.clip(x, 0, n_tiles - 1).astype('int64'), np.clip(y, 0, n_tiles - 1).astype('int64')
+
+def _tile_keys(x: np.ndarray, y: np.ndarray)-> np.ndarray:
+    return (x << 32) | y
+
+@dataclass
+class TileLayer:
+    features: pd.DataFrame
+    tile_keys: np.ndarray
+    order: np.ndarray
+
+    def query(self, keys: np.ndarray)-> pd.DataFrame:
+        start = np.searchsorted(self.tile_keys, keys, side='left')
+        stop = np.searchsorted(self.tile_keys, keys, side='right')
+        positions = [self.order[a:b] for a, b in zip(start, stop)]
+        positions = np.concatenate(positions) if positions else np.array([], dtype='int64')
+        return self.features.iloc[positions]
+
+@dataclass
+class TilePyramid:
+    df_points: pd.DataFrame
+    layers: dict[int, TileLayer] = field(default_factory=dict)
+
+    @classmethod
+    def from_points(cls, df_points: pd.DataFrame, zooms: range = range(MIN_ZOOM, MAX_ZOOM + 1))-> 'TilePyramid':
+        df_points = df_points[df_points['geolocation_lat'].notna() & df_points['geolocation_lng'].notna()]
+        pyramid = cls(df_points=df_points.reset_index(drop=True))
+        for zoom in zooms:
+            pyramid.layers[zoom] = pyramid._build_layer(zoom)
+        return pyramid
+
+    def _aggregate(self, zoom: int)-> pd.DataFrame:
+        level = level_for_zoom(zoom)
+        df_points = self.df_points
+        if level == 'point' or df_points.empty:
+            if 'count' not in df_points:
+                count = df_points['item_count'] if 'item_count' in df_points else 1
+                self.df_points = df_points = df_points.assign(count=count, label=df_points['product_macro_category_rename'].astype(str))
+            return df_points
+        if level == 'cell':
+            cell_size = 360.0 / 2 ** zoom / 8
+            cell_x = np.floor(df_points['geolocation_lng'].to_numpy() / cell_size).astype('int64')
+            cell_y = np.floor(df_points['geolocation_lat'].to_numpy() / cell_size).astype('int64')
+            unique_x, _, inverse = unique_cells(cell_x, cell_y)
+            df_features = aggregate_groups(df_points, inverse, len(unique_x))
+            df_features['label'] = df_features['count'].astype(str) + ' pedidos'
+            return df_features
+        codes, labels = pd.factorize(df_points[level], use_na_sentinel=False)
+        df_features = aggregate_groups(df_points, codes, len(labels))
+        df_features['label'] = pd.Index(labels).astype(str)
+        return df_features
+
+    def _build_layer(self, zoom: int)-> TileLayer:
+        df_features = self._aggregate(zoom)
+        x, y = tile_xy(df_features['geolocation_lat'].to_numpy(), df_features['geolocation_lng'].to_numpy(), zoom)
+        keys = _tile_keys(x, y)
+        order = np.argsort(keys, kind='stable')
+        # Point layers share the same frame across zooms, only the order differs.
+        return TileLayer(features=df_features, tile_keys=keys[order], order=order)
+
+    def layer(self, zoom: int)-> TileLayer:
+        zoom = min(max(int(zoom), MIN_ZOOM), MAX_ZOOM)
+        if zoom not in self.layers:
+            self.layers[zoom] = self._build_layer(zoom)
+        return self.layers[zoom]
+
+    def visible_tiles(self, south: float, west: float, north: float, east: float, zoom: int)-> np.ndarray:
+        zoom = min(max(int(zoom), MIN_ZOOM), MAX_ZOOM)
+        x_min, y_min = tile_xy(np.array([north]), np.array([west]), zoom)
+        x_max, y_max = tile_xy(np.array([south]), np.array([east]), zoom)
+        xs = np.arange(x_min[0], x_max[0] + 1)
+        ys = np.arange(y_min[0], y_max[0] + 1)
+        grid_x, grid_y = np.meshgrid(xs, ys)
+        return np.sort(_tile_keys(grid_x.ravel(), grid_y.ravel()))
+
+    @profiled
+    def query(self, bounds: dict | None, zoom: int)-> pd.DataFrame:
+        # bounds follows Leaflet's getBounds(), as returned by st_folium.
+        layer = self.layer(zoom)
+        if not bounds:
+            return layer.features
+        south_west, north_east = bounds['_southWest'], bounds['_northEast']
+        if south_west.get('lat') is None or north_east.get('lat') is None:
+            return layer.features
+        keys = self.visible_tiles(south_west['lat'], south_west['lng'], north_east['lat'], north_east['lng'], zoom)
+        return layer.query(keys)
+
+# Keyed by the filter selection; the frame itself is not hashed.
+@cache_resource(max_entries=16)
+def get_tile_pyramid(filter_key: tuple, _df_points: pd.DataFrame)-> TilePyramid:
+    return TilePyramid.from_points(_df_points)
+
+@profiled
+def style_features(df_features: pd.DataFrame, zoom: int)-> pd.DataFrame:
+    if level_for_zoom(zoom) == 'point':
+        radius = np.full(len(df_features), 4.0)
+    else:
+        radius = 4 + 16 * np.sqrt(df_features['count'] / max(df_features['count'].max(), 1))
+    return df_features.assign(
+        radius=radius,
+        color=color_of(df_features['product_macro_category_rename']),
+        opacity=0.6
+    )
@@ -0,0 +1,94 @@
+import streamlit as st
+import plotly.express as px
+from olist.cache import get_data_version
+from olist.flows import init_get_od_matrix, corridor_summary
+from olist.profiling import start_profile, finish_profile, span
+
+METRICAS = {
+    'Frete por km': 'freight_per_km',
+    'Itens': 'item_count',
+    'Distância média (km)': 'mean_distance_km',
+    'Frete médio': 'mean_freight',
+}
+
+st.set_page_config(layout="wide")
+profile = start_profile('Fluxos')
+st.write("# Fluxos de frete")
+st.write('Frete por corredor entre o estado do vendedor e o estado do cliente.')
+
+df_od = init_get_od_matrix(get_data_version())
+
+col1, col2, col3 = st.columns(3)
+with col1:
+    with st.expander("Filtro por ano"):
+        year_options = sorted(df_od['year'].unique().tolist())
+        years = st.multiselect(
+            'Ano',
+            options=year_options,
+            default=[year for year in year_options if year in (2017, 2018)] or year_options,
+            key='ano_fluxos'
+        )
+with col2:
+    with st.expander("Filtro por categoria"):
+        category_options = sorted(df_od['product_macro_category_rename'].astype(str).unique().tolist())
+        macro_category = st.multiselect(
+            'Categoria',
+            options=category_options,
+            default=category_options,
+            key='categoria_fluxos'
+        )
+with col3:
+    with st.expander("Itens mínimos por corredor"):
+        min_items = st.slider('Itens', min_value=1, max_value=100, value=10, key='itens_fluxos')
+
+df_corridors = corridor_summary(df_od, {
+    'year': years,
+    'product_macro_category_rename': macro_category,
+})
+df_corridors = df_corridors[df_corridors['item_count'] >= min_items]
+
+metric_name = st.radio('Métrica', options=list(METRICAS), index=0, horizontal=True, key='metrica_fluxos')
+metric = METRICAS[metric_name]
+
+if df_corridors.empty:
+    st.write('Nenhum corredor com os filtros selecionados.')
+else:
+    df_heatmap = df_corridors.pivot_table(
+        index='seller_state',
+        columns='customer_state',
+        values=metric,
+        observed=True
+    )
+    fig = px.imshow(
+        df_heatmap,
+        labels={'x': 'Estado do cliente', 'y': 'Estado do vendedor', 'color': metric_name},
+        color_continuous_scale='Viridis',
+        aspect='auto',
+        height=650,
+    )
+    with span('st.plotly_chart'):
+        st.plotly_chart(fig, use_container_width=True)
+
+    st.write("## Principais corredores")
+    df_table = df_corridors.sort_values(metric, ascending=False).head(20)
+    st.dataframe(
+        df_table.rename(columns={
+            'seller_state': 'Estado do vendedor',
+            'customer_state': 'Estado do cliente',
+            'item_count': 'Itens',
+            'freight_value': 'Frete total',
+            'freight_per_km': 'Frete por km',
+            'mean_distance_km': 'Distância média (km)',
+            'mean_freight': 'Frete médio',
+            'freight_share': 'Frete / preço',
+        })[['Estado do vendedor', 'Estado do cliente', 'Itens', 'Frete total', 'Frete por km', 'Distância média (km)', 'Frete médio', 'Frete / preço']],
+        hide_index=True,
+        use_container_width=True,
+    )
+
+st.caption(
+    'As distâncias são calculadas entre os centróides dos CEPs do vendedor e do cliente. '
+    'CEPs ausentes da geolocalização usam o CEP conhecido mais próximo do mesmo setor; '
+    'itens sem coordenadas ficam de fora.'
+)
+finish_profile(profile)
@@ -0,0 +1,23 @@
+import numpy as np
+import pandas as pd
+from olist.streaming import CodeBook
+from olist.tables import normalize_text_column
+
+def test_normalize_text_column_all_missing():
+    series = pd.Series([np.nan, np.nan], name='seller_city', dtype='object')
+    normalized = normalize_text_column(series)
+    assert normalized.isna().all()
+    assert normalized.name == 'seller_city'
+    assert len(normalized.cat.categories) == 0
+
+def test_normalize_text_column_merges_spellings():
+    normalized = normalize_text_column(pd.Series(['São Paulo', 'sao paulo', np.nan]))
+    assert normalized.tolist()[:2] == ['sao paulo', 'sao paulo']
+    assert pd.isna(normalized.iloc[2])
+
+def test_code_book_all_missing_chunk():
+    code_book = CodeBook()
+    assert code_book.encode(pd.Series([np.nan, np.nan], dtype='object')).tolist() == [-1, -1]
+    assert code_book.encode(pd.Series(['SP', np.nan, 'RJ'])).tolist() == [0, -1, 1]
+    assert code_book.encode(pd.Series([np.nan], dtype='object')).tolist() == [-1]
+    assert code_book.values == ['SP', 'RJ']